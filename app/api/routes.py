@@ -1,13 +1,16 @@
 """API routes for inference service."""
-from typing import Any, Dict, List, Optional
+import asyncio
+from typing import Any, Dict, Optional
 
-from fastapi import APIRouter, Depends, HTTPException
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import ORJSONResponse
 
-from app.services.inference_service import InferenceService
-from app.utils.config import get_settings
-import asyncio
-from app.services.circuit_breaker import CircuitBreakerOpen
+from app.api.schemas import InstancesRequest
 from app.deps import get_inference_service
+from app.models.base import InvalidFeaturesError
+from app.services.circuit_breaker import CircuitBreakerOpen
+from app.services.inference_service import InferenceService
 
 router = APIRouter()
 
@@ -19,15 +22,25 @@ def health(service: InferenceService = Depends(get_inference_service)) -> Dict[s
 
 @router.post("/predict")
 async def predict(
-    payload: Dict[str, List[Dict[str, Any]]],
+    request: Request,
     version: Optional[str] = None,
     service: InferenceService = Depends(get_inference_service),
-) -> Dict[str, Any]:
-    features = payload.get("instances")
+) -> ORJSONResponse:
+    # Hot path: decode the raw body with orjson instead of routing it through
+    # Starlette's JSON parsing and pydantic validation.
+    try:
+        payload = orjson.loads(await request.body())
+    except orjson.JSONDecodeError:
+        raise HTTPException(status_code=400, detail="Request body must be valid JSON")
+    features = payload.get("instances") if isinstance(payload, dict) else None
     if features is None:
         raise HTTPException(status_code=400, detail="instances field is required")
+    if not isinstance(features, list) or not all(isinstance(row, dict) for row in features):
+        raise HTTPException(status_code=400, detail="instances must be a list of objects")
     try:
-        return await service.predict(features=features, model_version=version)
+        return ORJSONResponse(content=await service.predict(features=features, model_version=version))
+    except InvalidFeaturesError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
     except asyncio.QueueFull:
         raise HTTPException(status_code=503, detail="Service overloaded (queue full)")
     except CircuitBreakerOpen:
@@ -36,11 +49,11 @@ async def predict(
 
 @router.post("/batch")
 def submit_batch(
-    payload: Dict[str, List[Dict[str, Any]]],
+    payload: InstancesRequest,
     version: Optional[str] = None,
     service: InferenceService = Depends(get_inference_service),
 ) -> Dict[str, Any]:
-    features = payload.get("instances")
+    features = payload.instances
     if features is None:
         raise HTTPException(status_code=400, detail="instances field is required")
     job_id = service.enqueue_batch(features, model_version=version)
@@ -0,0 +1,18 @@
+"""Request schemas for the inference API."""
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel, ConfigDict
+
+
+class InstancesRequest(BaseModel):
+    """Body for the batch endpoint; unknown fields are ignored.
+
+    ``/predict`` parses its raw body with orjson and does not use this model.
+    """
+
+    model_config = ConfigDict(extra="ignore")
+
+    instances: Optional[List[Dict[str, Any]]] = None
+
+
+__all__ = ["InstancesRequest"]
@@ -1,28 +1,35 @@
 """FastAPI application setup."""
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 
+from app.api.admin_routes import router as admin_router
 from app.api.routes import router
+from app.deps import init_dependencies
 from app.monitoring.logger import configure_logging
 from app.utils.config import get_settings
 
 settings = get_settings()
 configure_logging(settings.service_name)
 
-from contextlib import asynccontextmanager
-from app.deps import get_inference_service
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Start up services
-    service = get_inference_service()
+    # Start up services (builds the dependency singletons before traffic)
+    service = init_dependencies()
     service.start()
     yield
     # Shut down services
     await service.stop()
 
-from app.api.admin_routes import router as admin_router
 
-app = FastAPI(title=settings.service_name, version="0.1.0", lifespan=lifespan)
+app = FastAPI(
+    title=settings.service_name,
+    version="0.1.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
+)
 app.include_router(router)
 app.include_router(admin_router)
 
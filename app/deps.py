@@ -1,55 +1,105 @@
-"""Dependency wiring for FastAPI routes."""
-from functools import lru_cache
+"""Dependency wiring for FastAPI routes.
+
+Singletons are built once by ``init_dependencies`` (called from the app
+lifespan) and stored in module globals, so resolving a dependency on each
+request is a plain global load with no cache lock. Getters fall back to
+building the singletons on first use when no lifespan ran (e.g. scripts).
+"""
+import threading
+from typing import Optional
 
 from app.models.registry import ModelRegistry
 from app.monitoring.drift import DriftTracker
 from app.monitoring.logger import configure_logging
 from app.monitoring.metrics import MetricsCollector
+from app.services.batch_worker import init_worker
 from app.services.inference_service import InferenceService
 from app.services.job_manager import JobManager
 from app.utils.config import get_settings
 
+_init_lock = threading.Lock()
+_registry: Optional[ModelRegistry] = None
+_metrics: Optional[MetricsCollector] = None
+_drift_tracker: Optional[DriftTracker] = None
+_job_manager: Optional[JobManager] = None
+_inference_service: Optional[InferenceService] = None
+
+
+def init_dependencies() -> InferenceService:
+    """Build the process-wide singletons if they do not exist yet."""
+
+    global _registry, _metrics, _drift_tracker, _job_manager, _inference_service
+    with _init_lock:
+        if _inference_service is None:
+            settings = get_settings()
+            configure_logging(settings.service_name)
+            _registry = ModelRegistry(
+                registry_path=settings.model_registry_path,
+                default_version=settings.default_model_version,
+                simulate_latency=settings.simulate_gpu_latency,
+                max_loaded_models=settings.max_loaded_models,
+            )
+            _metrics = MetricsCollector()
+            _drift_tracker = DriftTracker(
+                window_size=settings.drift_window, threshold=settings.drift_threshold
+            )
+            worker_init = {}
+            if settings.batch_backend == "process":
+                worker_init = {
+                    "initializer": init_worker,
+                    "initargs": (
+                        str(settings.model_registry_path),
+                        settings.default_model_version,
+                        settings.simulate_gpu_latency,
+                    ),
+                }
+            _job_manager = JobManager(
+                max_workers=settings.batch_max_workers,
+                backend=settings.batch_backend,
+                **worker_init,
+            )
+            _inference_service = InferenceService(
+                settings=settings,
+                registry=_registry,
+                metrics=_metrics,
+                drift_tracker=_drift_tracker,
+                job_manager=_job_manager,
+            )
+        return _inference_service
+
 
-@lru_cache()
 def get_registry() -> ModelRegistry:
-    settings = get_settings()
-    return ModelRegistry(
-        registry_path=settings.model_registry_path,
-        default_version=settings.default_model_version,
-    )
+    if _registry is None:
+        init_dependencies()
+    return _registry  # type: ignore[return-value]
 
 
-@lru_cache()
 def get_metrics() -> MetricsCollector:
-    return MetricsCollector()
+    if _metrics is None:
+        init_dependencies()
+    return _metrics  # type: ignore[return-value]
 
 
-@lru_cache()
 def get_drift_tracker() -> DriftTracker:
-    settings = get_settings()
-    return DriftTracker(window_size=settings.drift_window, threshold=settings.drift_threshold)
+    if _drift_tracker is None:
+        init_dependencies()
+    return _drift_tracker  # type: ignore[return-value]
 
 
-@lru_cache()
 def get_job_manager() -> JobManager:
-    settings = get_settings()
-    return JobManager(max_workers=settings.batch_max_workers)
+    if _job_manager is None:
+        init_dependencies()
+    return _job_manager  # type: ignore[return-value]
 
 
-@lru_cache()
 def get_inference_service() -> InferenceService:
-    settings = get_settings()
-    configure_logging(settings.service_name)
-    return InferenceService(
-        settings=settings,
-        registry=get_registry(),
-        metrics=get_metrics(),
-        drift_tracker=get_drift_tracker(),
-        job_manager=get_job_manager(),
-    )
+    if _inference_service is None:
+        return init_dependencies()
+    return _inference_service
 
 
 __all__ = [
+    "init_dependencies",
     "get_registry",
     "get_metrics",
     "get_drift_tracker",
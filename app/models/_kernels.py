@@ -0,0 +1,123 @@
+"""Numeric kernels shared by the linear example models.
+
+Kernels are JIT-compiled with Numba when it is installed; otherwise
+equivalent NumPy implementations with the same signatures are used. The
+scoring kernel expects the feature matrix in column-major (Fortran) order so
+each feature column is streamed contiguously while its weight stays in a
+register. The activation kernel turns raw scores into probabilities, labels
+and confidences in place, for callers that compute scores themselves.
+"""
+from __future__ import annotations
+
+import math
+from typing import Tuple
+
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:  # pragma: no cover - depends on the deployment image
+    njit = None
+
+# Features per tile when accumulating very wide schemas; keeps the weight
+# slice and the column block being streamed resident in L1.
+FEATURE_TILE = 64
+
+
+def _score_numpy(
+    X: np.ndarray,
+    w: np.ndarray,
+    bias: float,
+    out_prob: np.ndarray,
+    out_label: np.ndarray,
+    out_conf: np.ndarray,
+) -> None:
+    n_features = X.shape[1]
+    if n_features <= FEATURE_TILE:
+        scores = X @ w + bias
+    else:
+        scores = np.full(X.shape[0], bias, dtype=np.float64)
+        for start in range(0, n_features, FEATURE_TILE):
+            stop = start + FEATURE_TILE
+            scores += X[:, start:stop] @ w[start:stop]
+    out_prob[:] = scores
+    _activate_numpy(out_prob, out_label, out_conf)
+
+
+def _activate_numpy(out_prob: np.ndarray, out_label: np.ndarray, out_conf: np.ndarray) -> None:
+    with np.errstate(over="ignore"):
+        np.divide(1.0, 1.0 + np.exp(-out_prob), out=out_prob)
+    np.greater_equal(out_prob, 0.5, out=out_label)
+    np.multiply(np.abs(out_prob - 0.5), 2, out=out_conf)
+
+
+def _activate_loop(out_prob, out_label, out_conf):  # type: ignore[no-untyped-def]
+    for i in range(out_prob.shape[0]):
+        s = out_prob[i]
+        if s < -700.0:
+            p = 0.0
+        else:
+            p = 1.0 / (1.0 + math.exp(-s))
+        out_prob[i] = p
+        out_label[i] = 1 if p >= 0.5 else 0
+        out_conf[i] = abs(p - 0.5) * 2
+
+
+def _score_loop(X, w, bias, out_prob, out_label, out_conf):  # type: ignore[no-untyped-def]
+    n = X.shape[0]
+    for i in range(n):
+        out_prob[i] = bias
+    # Column-outer loop: X is Fortran-ordered, so X[:, j] is contiguous.
+    for j in range(X.shape[1]):
+        wj = w[j]
+        for i in range(n):
+            out_prob[i] += X[i, j] * wj
+    activate_kernel(out_prob, out_label, out_conf)
+
+
+def quantize_int8(values: np.ndarray) -> Tuple[np.ndarray, float]:
+    """Symmetrically quantize ``values`` to int8, returning ``(q, scale)``.
+
+    ``q * scale`` approximates ``values``; the memory layout is preserved.
+    """
+
+    peak = float(np.max(np.abs(values))) if values.size else 0.0
+    if peak == 0.0:
+        return np.zeros_like(values, dtype=np.int8), 1.0
+    scale = peak / 127.0
+    return np.rint(values / scale).astype(np.int8), scale
+
+
+def quantize_int8_rows(X: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Quantize each row of an (N, F) matrix to int8 with its own scale.
+
+    Returns ``(q, scales)`` with ``q[i] * scales[i]`` approximating ``X[i]``,
+    so a row's result never depends on the other rows in its batch.
+    """
+
+    peaks = np.max(np.abs(X), axis=1) if X.size else np.zeros(X.shape[0])
+    scales = np.where(peaks > 0.0, peaks / 127.0, 1.0)
+    return np.rint(X / scales[:, None]).astype(np.int8), scales
+
+
+if njit is not None:
+    # score_kernel resolves activate_kernel as a global at compile time, so the
+    # activation must be jitted first. No fastmath and NumPy's error model, so
+    # NaN/inf propagate exactly as in the NumPy fallback instead of raising.
+    activate_kernel = njit(cache=True, error_model="numpy")(_activate_loop)
+    score_kernel = njit(cache=True, error_model="numpy")(_score_loop)
+    HAS_NUMBA = True
+else:
+    activate_kernel = _activate_numpy
+    score_kernel = _score_numpy
+    HAS_NUMBA = False
+
+
+__all__ = [
+    "score_kernel",
+    "activate_kernel",
+    "quantize_int8",
+    "quantize_int8_rows",
+    "HAS_NUMBA",
+    "FEATURE_TILE",
+]
@@ -2,16 +2,47 @@
 from abc import ABC, abstractmethod
 from typing import Any, Dict, List
 
+import numpy as np
+
+
+class InvalidFeaturesError(ValueError):
+    """Raised by ``Model.pack`` when a request's feature values cannot be scored."""
+
 
 class Model(ABC):
     """Abstract base class for inference models."""
 
     version: str
+    # True when the model runs on a device that serves one call at a time
+    # (e.g. a single GPU); the service then serializes its calls and gives
+    # online requests priority over batch jobs.
+    exclusive_device: bool = False
 
     @abstractmethod
     def predict(self, features: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """Return predictions for a list of feature dictionaries."""
 
+    @abstractmethod
+    def pack(self, features: List[Dict[str, Any]]) -> np.ndarray:
+        """Pack feature dictionaries into an (N, F) matrix in model feature order.
+
+        Raises ``InvalidFeaturesError`` for values that are not finite numbers.
+        """
+
+    @abstractmethod
+    def predict_packed(self, X: np.ndarray) -> List[Dict[str, Any]]:
+        """Return predictions for a matrix produced by ``pack``."""
+
     @abstractmethod
     def metadata(self) -> Dict[str, Any]:
         """Return model metadata such as version and feature schema."""
+
+    def close(self) -> None:
+        """Release resources held by the model (e.g. device memory).
+
+        Called by the registry after the model is unloaded or evicted, once
+        no ``ModelRegistry.lease`` on it is active.
+        """
+
+
+__all__ = ["Model", "InvalidFeaturesError"]
@@ -1,57 +1,137 @@
 """Example deterministic model used for inference scaffolding."""
 from __future__ import annotations
 
-import json
-import math
+import mmap
 import threading
 import time
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Callable, Dict, List, Sequence, Tuple
 
-from app.models.base import Model
+import numpy as np
+import orjson
+
+from app.models._kernels import activate_kernel, quantize_int8, quantize_int8_rows, score_kernel
+from app.models.base import InvalidFeaturesError, Model
+
+
+def _build_extractor(feature_names: Sequence[str]) -> Callable[[Dict[str, Any]], Tuple[Any, ...]]:
+    """Generate a row -> tuple extractor unrolled for a fixed feature order.
+
+    The generated function is straight-line code, so packing a row costs one
+    bound ``get`` per feature with no per-cell loop or name lookup.
+    """
+
+    fields = "".join(f"get({name!r}, 0.0), " for name in feature_names)
+    source = f"def _extract(row):\n    get = row.get\n    return ({fields})\n"
+    namespace: Dict[str, Any] = {}
+    exec(compile(source, "<example_model extractor>", "exec"), namespace)
+    return namespace["_extract"]
+
+
+def _read_artifact(model_path: Path) -> Dict[str, Any]:
+    """Parse a JSON artifact straight from a read-only memory map."""
+
+    with open(model_path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            with memoryview(mm) as view:
+                return orjson.loads(view)
 
 
 class ExampleModel(Model):
-    def __init__(self, version: str, model_path: Path) -> None:
+    def __init__(self, version: str, model_path: Path, simulate_latency: bool = False) -> None:
         self.version = version
-        with open(model_path, "r", encoding="utf-8") as f:
-            payload = json.load(f)
+        self._simulate_latency = simulate_latency
+        # Simulated latency stands in for a single GPU.
+        self.exclusive_device = simulate_latency
+        payload = _read_artifact(model_path)
         self.bias: float = float(payload.get("bias", 0.0))
         self.weights: Dict[str, float] = {
             key: float(value) for key, value in payload.get("weights", {}).items()
         }
+        # Freeze the feature order once so every batch packs into the same layout.
+        self._feature_names = tuple(self.weights)
+        self._w = np.fromiter(
+            (self.weights[name] for name in self._feature_names),
+            dtype=np.float64,
+            count=len(self._feature_names),
+        )
+        self._extract = _build_extractor(self._feature_names)
+        # Artifacts may opt into int8 weights with a per-model scale; scores
+        # are then computed as an int32 dot product and dequantized.
+        self.quantization = payload.get("quantization")
+        if self.quantization not in (None, "int8"):
+            raise ValueError(f"Unsupported quantization {self.quantization!r} for version {version}")
+        if self.quantization == "int8":
+            w_i8, self._w_scale = quantize_int8(self._w)
+            self._w_i32 = w_i8.astype(np.int32)
+        # Weights are immutable after load, so metadata is built once.
+        self._metadata: Dict[str, Any] = {
+            "version": self.version,
+            "features": sorted(self.weights),
+        }
         # Simulate GPU lock (only one inference at a time per model instance)
         self._lock = threading.Lock()
 
+    def pack(self, features: List[Dict[str, Any]]) -> np.ndarray:
+        # Pack the batch into a Fortran-ordered (N, F) matrix so the kernel
+        # streams one contiguous feature column per weight.
+        try:
+            X = np.array(list(map(self._extract, features)), dtype=np.float64, order="F")
+        except (TypeError, ValueError) as exc:
+            raise InvalidFeaturesError(f"Feature values must be numbers: {exc}") from exc
+        # NumPy turns JSON null into NaN; reject it (and inf) here so one bad
+        # row fails its own request instead of the micro-batch it joins.
+        if not np.isfinite(X).all():
+            raise InvalidFeaturesError("Feature values must be finite numbers")
+        return X.reshape(len(features), len(self._feature_names))
+
     def predict(self, features: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        # Simulate GPU latency: processing a batch takes roughly fixed time
-        # regardless of size (up to a limit), unlike CPU loops.
-        # Enforce serial execution to simulate single GPU resource.
-        with self._lock:
+        return self.predict_packed(self.pack(features))
+
+    def predict_packed(self, X: np.ndarray) -> List[Dict[str, Any]]:
+        n = X.shape[0]
+        if self._simulate_latency:
             # Simulate GPU latency: Base overhead + per-item processing time
             # e.g., 10ms base + 1ms per item.
             # Batch of 32: ~42ms. Batch of 1000: ~1.01s.
-            latency = 0.01 + (0.001 * len(features))
-            time.sleep(latency)
-
-        predictions: List[Dict[str, Any]] = []
-        for row in features:
-            score = self.bias
-            for name, weight in self.weights.items():
-                score += float(row.get(name, 0.0)) * weight
-            probability = 1 / (1 + math.exp(-score))
-            predictions.append(
-                {
-                    "probability": probability,
-                    "label": int(probability >= 0.5),
-                    "version": self.version,
-                    "confidence": float(abs(probability - 0.5) * 2),
-                }
+            # Only the simulated "kernel launch" is serialized; the lock is
+            # released before scoring. BatchScheduler calls predict once per
+            # batch, so the base overhead is paid per batch, not per request.
+            with self._lock:
+                latency = 0.01 + (0.001 * n)
+                time.sleep(latency)
+
+        # Score with a single fused kernel instead of a Python loop per
+        # (row, weight) pair.
+        probabilities = np.empty(n, dtype=np.float64)
+        labels = np.empty(n, dtype=np.int8)
+        confidences = np.empty(n, dtype=np.float64)
+        if self.quantization == "int8":
+            # Per-row activation scales: a row scores the same whatever
+            # other requests the scheduler batched it with.
+            X_i8, x_scale = quantize_int8_rows(X)
+            acc = X_i8.astype(np.int32) @ self._w_i32
+            np.multiply(acc, self._w_scale * x_scale, out=probabilities)
+            probabilities += self.bias
+            activate_kernel(probabilities, labels, confidences)
+        else:
+            score_kernel(X, self._w, self.bias, probabilities, labels, confidences)
+
+        return [
+            {
+                "probability": probability,
+                "label": label,
+                "version": self.version,
+                "confidence": confidence,
+            }
+            for probability, label, confidence in zip(
+                probabilities.tolist(), labels.tolist(), confidences.tolist()
             )
-        return predictions
+        ]
 
     def metadata(self) -> Dict[str, Any]:
-        return {"version": self.version, "features": sorted(self.weights.keys())}
+        """Return the cached metadata; callers must treat it as read-only."""
+        return self._metadata
 
 
 __all__ = ["ExampleModel"]
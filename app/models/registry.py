@@ -1,33 +1,60 @@
 """Model registry abstraction for loading versioned models."""
 from __future__ import annotations
 
+import itertools
+import threading
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Dict
+from typing import Dict, Iterator, List
 
 from app.models.base import Model
 from app.models.example_model import ExampleModel
+from app.monitoring.logger import logger
 
 
+class _Resident:
+    """A loaded model with its LRU tick and count of in-flight leases."""
+
+    __slots__ = ("model", "last_used", "leases", "retired")
+
+    def __init__(self, model: Model, last_used: int) -> None:
+        self.model = model
+        self.last_used = last_used
+        self.leases = 0
+        self.retired = False
 
-import threading
-from typing import Dict, Optional, List
 
 class ModelRegistry:
     """Loads models from a versioned local registry.
     
     Supports dynamic loading, unloading, and promoting/rolling back default versions.
+    At most ``max_loaded_models`` versions stay resident; the least recently
+    used non-default version is evicted when a load exceeds it. An evicted or
+    unloaded model is closed once no ``lease`` on it is active.
     """
 
-    def __init__(self, registry_path: Path, default_version: str = "v1") -> None:
+    def __init__(
+        self,
+        registry_path: Path,
+        default_version: str = "v1",
+        simulate_latency: bool = False,
+        max_loaded_models: int = 4,
+    ) -> None:
         self.registry_path = registry_path
-        self._loaded_models: Dict[str, Model] = {}
+        self.simulate_latency = simulate_latency
+        self.max_loaded_models = max_loaded_models
+        # Recency ticks live on each entry. Stamping one is a single attribute
+        # store, so cache hits record use without taking the lock, and a
+        # stamp on an entry evicted meanwhile is dropped with it.
+        self._loaded_models: Dict[str, _Resident] = {}
+        self._clock = itertools.count()
         self._default_version = default_version
         self._lock = threading.RLock()
 
     @property
     def default_version(self) -> str:
-        with self._lock:
-            return self._default_version
+        # A single attribute read is atomic; writers still serialize on the lock.
+        return self._default_version
 
     def list_loaded_versions(self) -> List[str]:
         with self._lock:
@@ -45,26 +72,84 @@ class ModelRegistry:
             self._default_version = version
 
     def load(self, version: str) -> Model:
-        """Load a model version into memory."""
+        """Load a model version into memory.
+
+        Cache hits are served without locking (dict reads are atomic under
+        the GIL); only a miss takes the lock, re-checks, and reads from disk.
+        """
+        entry = self._loaded_models.get(version)
+        if entry is not None:
+            entry.last_used = next(self._clock)
+            return entry.model
+
         with self._lock:
-            if version in self._loaded_models:
-                return self._loaded_models[version]
-            
+            entry = self._loaded_models.get(version)
+            if entry is not None:
+                entry.last_used = next(self._clock)
+                return entry.model
+
             version_dir = self.registry_path / version
             model_file = version_dir / "model.json"
             if not model_file.exists():
                 raise FileNotFoundError(f"Model artifact not found for version {version}")
-            
-            model = ExampleModel(version=version, model_path=model_file)
-            self._loaded_models[version] = model
+
+            model = ExampleModel(
+                version=version,
+                model_path=model_file,
+                simulate_latency=self.simulate_latency,
+            )
+            self._loaded_models[version] = _Resident(model, next(self._clock))
+            self._evict(keep=version)
             return model
 
+    @contextmanager
+    def lease(self, version: str) -> Iterator[Model]:
+        """Load ``version`` and keep the model open until the block exits.
+
+        Use this around predictions: the model may still be evicted or
+        unloaded meanwhile, but its ``close()`` waits for the last lease.
+        """
+        with self._lock:
+            self.load(version)
+            entry = self._loaded_models[version]
+            entry.leases += 1
+        try:
+            yield entry.model
+        finally:
+            with self._lock:
+                entry.leases -= 1
+                close = entry.retired and not entry.leases
+            if close:
+                entry.model.close()
+
+    def _evict(self, keep: str) -> None:
+        """Evict least recently used models above the size bound.
+
+        The default version and ``keep`` (the model just loaded) are pinned.
+        """
+        while len(self._loaded_models) > self.max_loaded_models:
+            candidates = [
+                v for v in self._loaded_models if v != self._default_version and v != keep
+            ]
+            if not candidates:
+                return
+            victim = min(candidates, key=lambda v: self._loaded_models[v].last_used)
+            self._retire(self._loaded_models.pop(victim))
+            logger.info("model evicted", extra={"ctx_version": victim})
+
     def unload(self, version: str) -> None:
         """Unload a model version from memory."""
         with self._lock:
             if version == self._default_version:
                 raise ValueError(f"Cannot unload the default version ({version})")
-            if version in self._loaded_models:
-                del self._loaded_models[version]
+            entry = self._loaded_models.pop(version, None)
+            if entry is not None:
+                self._retire(entry)
+
+    def _retire(self, entry: _Resident) -> None:
+        """Close a model removed from the registry, or defer it to its last lease."""
+        entry.retired = True
+        if not entry.leases:
+            entry.model.close()
 
 __all__ = ["ModelRegistry"]
@@ -1,7 +1,10 @@
 """Simple statistical drift detection utilities."""
 from collections import deque
 from dataclasses import dataclass
-from typing import Deque, Dict, List
+from itertools import islice
+from typing import Deque, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
 
 
 @dataclass
@@ -12,44 +15,151 @@ class DriftSignal:
     drift_score: float
 
 
+class RollingMean:
+    """Fixed-size window of values with an O(1) running mean.
+
+    The running sum is updated on append/evict and recomputed from the window
+    once every ``maxlen`` evictions to keep floating-point error bounded.
+    """
+
+    __slots__ = ("buf", "sum", "maxlen", "_evictions")
+
+    def __init__(self, maxlen: int) -> None:
+        self.buf: Deque[float] = deque(maxlen=maxlen)
+        self.sum = 0.0
+        self.maxlen = maxlen
+        self._evictions = 0
+
+    def __len__(self) -> int:
+        return len(self.buf)
+
+    @property
+    def full(self) -> bool:
+        return len(self.buf) == self.maxlen
+
+    def add(self, value: float) -> None:
+        buf = self.buf
+        if len(buf) == self.maxlen:
+            # deque(maxlen) evicts the left end on append; read it first.
+            self.sum -= buf[0]
+            self._evictions += 1
+        buf.append(value)
+        self.sum += value
+        if self._evictions >= self.maxlen:
+            self.sum = sum(buf)
+            self._evictions = 0
+
+    def extend(self, values: np.ndarray) -> None:
+        """Append a chunk of values, evicting from the left as needed."""
+
+        count = len(values)
+        if count == 0:
+            return
+        buf = self.buf
+        if count >= self.maxlen:
+            tail = values[-self.maxlen :]
+            buf.clear()
+            buf.extend(tail.tolist())
+            self.sum = float(tail.sum())
+            self._evictions = 0
+            return
+        overflow = len(buf) + count - self.maxlen
+        if overflow > 0:
+            self.sum -= sum(islice(buf, overflow))
+            self._evictions += overflow
+        buf.extend(values.tolist())
+        self.sum += float(values.sum())
+        if self._evictions >= self.maxlen:
+            self.sum = sum(buf)
+            self._evictions = 0
+
+    def mean(self) -> float:
+        return self.sum / len(self.buf)
+
+
 class DriftTracker:
     """Tracks mean statistics for features and signals drift when they diverge."""
 
     def __init__(self, window_size: int, threshold: float) -> None:
         self.window_size = window_size
         self.threshold = threshold
-        self._buffers: Dict[str, Deque[float]] = {}
+        self._buffers: Dict[str, RollingMean] = {}
         self._baselines: Dict[str, float] = {}
 
-    def _mean(self, values: Deque[float]) -> float:
-        return sum(values) / len(values)
+    def _buffer(self, name: str) -> RollingMean:
+        buffer = self._buffers.get(name)
+        if buffer is None:
+            buffer = self._buffers[name] = RollingMean(self.window_size)
+        return buffer
+
+    def _signal(self, name: str, baseline_mean: float, current_mean: float) -> Optional[DriftSignal]:
+        if baseline_mean == 0:
+            return None
+        drift_score = abs(current_mean - baseline_mean) / abs(baseline_mean)
+        if drift_score < self.threshold:
+            return None
+        return DriftSignal(
+            feature=name,
+            baseline_mean=baseline_mean,
+            current_mean=current_mean,
+            drift_score=drift_score,
+        )
 
     def update(self, features: Dict[str, float]) -> List[DriftSignal]:
         """Update tracked features and return any drift signals."""
 
         signals: List[DriftSignal] = []
         for name, value in features.items():
-            buffer = self._buffers.setdefault(name, deque(maxlen=self.window_size))
-            buffer.append(value)
-            if name not in self._baselines and len(buffer) == buffer.maxlen:
-                self._baselines[name] = self._mean(buffer)
+            buffer = self._buffer(name)
+            buffer.add(value)
+            if not buffer.full:
                 continue
-            if name in self._baselines and len(buffer) == buffer.maxlen:
-                baseline_mean = self._baselines[name]
-                current_mean = self._mean(buffer)
-                if baseline_mean == 0:
-                    continue
-                drift_score = abs(current_mean - baseline_mean) / abs(baseline_mean)
-                if drift_score >= self.threshold:
-                    signals.append(
-                        DriftSignal(
-                            feature=name,
-                            baseline_mean=baseline_mean,
-                            current_mean=current_mean,
-                            drift_score=drift_score,
-                        )
-                    )
+            baseline_mean = self._baselines.get(name)
+            if baseline_mean is None:
+                self._baselines[name] = buffer.mean()
+                continue
+            signal = self._signal(name, baseline_mean, buffer.mean())
+            if signal is not None:
+                signals.append(signal)
         return signals
 
+    def score_array(self, values: np.ndarray, names: Sequence[str]) -> np.ndarray:
+        """Absorb an (N, F) matrix and return each column's drift score.
+
+        Columns are the features in ``names``; NaN cells mark missing values
+        and are skipped. Scores are NaN for features without a baseline yet,
+        with a zero baseline, or with no values in this chunk, so ``scores >= threshold`` selects exactly the drifting features.
+        """
+
+        baselines = np.full(len(names), np.nan)
+        currents = np.full(len(names), np.nan)
+        for j, name in enumerate(names):
+            column = values[:, j]
+            means = self._absorb_means(name, column[~np.isnan(column)])
+            if means is not None:
+                baselines[j], currents[j] = means
+        with np.errstate(divide="ignore", invalid="ignore"):
+            scores = np.abs(currents - baselines) / np.abs(baselines)
+        scores[baselines == 0] = np.nan
+        return scores
+
+    def _absorb_means(self, name: str, values: np.ndarray) -> Optional[Tuple[float, float]]:
+        """Add ``values`` to the feature's window; return (baseline, current) means."""
+        buffer = self._buffer(name)
+        baseline_mean = self._baselines.get(name)
+        if baseline_mean is None:
+            # The baseline is the mean of the first full window, even when
+            # that window fills part-way through this chunk.
+            needed = buffer.maxlen - len(buffer)
+            if len(values) < needed:
+                buffer.extend(values)
+                return None
+            buffer.extend(values[:needed])
+            baseline_mean = self._baselines[name] = buffer.mean()
+            values = values[needed:]
+            if not len(values):
+                return None
+        buffer.extend(values)
+        return baseline_mean, buffer.mean()
 
-__all__ = ["DriftTracker", "DriftSignal"]
+__all__ = ["DriftTracker", "DriftSignal", "RollingMean"]
@@ -1,29 +1,45 @@
 """Structured logging utilities."""
-import json
 import logging
-from typing import Any, Dict
 
+import orjson
 
-def configure_logging(service_name: str) -> None:
-    """Configure a structured JSON logger for the service."""
+_CTX_PREFIX = "ctx_"
+_CTX_PREFIX_LEN = len(_CTX_PREFIX)
+
+
+class JsonFormatter(logging.Formatter):
+    """Render log records as single-line JSON with ``ctx_*`` extras inlined."""
+
+    service_name = ""
 
-    class JsonFormatter(logging.Formatter):
-        def format(self, record: logging.LogRecord) -> str:  # type: ignore[override]
-            payload: Dict[str, Any] = {
-                "level": record.levelname,
-                "message": record.getMessage(),
-                "logger": record.name,
-                "service": service_name,
+    def __init__(self, service_name: str) -> None:
+        super().__init__()
+        self.service_name = service_name
+
+    def format(self, record: logging.LogRecord) -> str:  # type: ignore[override]
+        payload = {
+            "level": record.levelname,
+            "message": record.getMessage(),
+            "logger": record.name,
+            "service": self.service_name,
+        }
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        payload.update(
+            {
+                key[_CTX_PREFIX_LEN:]: value
+                for key, value in record.__dict__.items()
+                if key.startswith(_CTX_PREFIX)
             }
-            if record.exc_info:
-                payload["exc_info"] = self.formatException(record.exc_info)
-            for key, value in getattr(record, "__dict__", {}).items():
-                if key.startswith("ctx_"):
-                    payload[key[4:]] = value
-            return json.dumps(payload)
+        )
+        return orjson.dumps(payload, default=str).decode()
+
+
+def configure_logging(service_name: str) -> None:
+    """Configure a structured JSON logger for the service."""
 
     handler = logging.StreamHandler()
-    handler.setFormatter(JsonFormatter())
+    handler.setFormatter(JsonFormatter(service_name))
     root = logging.getLogger()
     root.setLevel(logging.INFO)
     root.handlers.clear()
@@ -32,4 +48,4 @@ def configure_logging(service_name: str) -> None:
 
 logger = logging.getLogger("inference-service")
 
-__all__ = ["configure_logging", "logger"]
+__all__ = ["configure_logging", "JsonFormatter", "logger"]
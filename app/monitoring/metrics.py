@@ -1,39 +1,157 @@
 """Lightweight in-memory metrics collector."""
-import statistics
+import bisect
 import threading
-from collections import defaultdict, deque
-from typing import Deque, Dict, Iterable, List
+import time
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+
+class P2Quantile:
+    """Streaming quantile estimate using the P² algorithm (Jain & Chlamtac).
+
+    Keeps five markers instead of the observations, so ``add`` and ``value``
+    are O(1) in time and memory regardless of how many samples were seen.
+    """
+
+    __slots__ = ("q", "_heights", "_positions", "_desired", "_increments")
+
+    def __init__(self, q: float) -> None:
+        self.q = q
+        self._heights: List[float] = []
+        self._positions = [1, 2, 3, 4, 5]
+        self._desired = [1.0, 1 + 2 * q, 1 + 4 * q, 3 + 2 * q, 5.0]
+        self._increments = [0.0, q / 2, q, (1 + q) / 2, 1.0]
+
+    def add(self, x: float) -> None:
+        heights = self._heights
+        if len(heights) < 5:
+            bisect.insort(heights, x)
+            return
+
+        positions = self._positions
+        if x < heights[0]:
+            heights[0] = x
+            k = 0
+        elif x >= heights[4]:
+            heights[4] = x
+            k = 3
+        else:
+            k = bisect.bisect_right(heights, x) - 1
+        for i in range(k + 1, 5):
+            positions[i] += 1
+        desired = self._desired
+        for i in range(5):
+            desired[i] += self._increments[i]
+
+        for i in (1, 2, 3):
+            d = desired[i] - positions[i]
+            if (d >= 1 and positions[i + 1] - positions[i] > 1) or (
+                d <= -1 and positions[i - 1] - positions[i] < -1
+            ):
+                step = 1 if d > 0 else -1
+                candidate = self._parabolic(i, step)
+                if not heights[i - 1] < candidate < heights[i + 1]:
+                    candidate = self._linear(i, step)
+                heights[i] = candidate
+                positions[i] += step
+
+    def _parabolic(self, i: int, d: int) -> float:
+        h, n = self._heights, self._positions
+        return h[i] + d / (n[i + 1] - n[i - 1]) * (
+            (n[i] - n[i - 1] + d) * (h[i + 1] - h[i]) / (n[i + 1] - n[i])
+            + (n[i + 1] - n[i] - d) * (h[i] - h[i - 1]) / (n[i] - n[i - 1])
+        )
+
+    def _linear(self, i: int, d: int) -> float:
+        h, n = self._heights, self._positions
+        return h[i] + d * (h[i + d] - h[i]) / (n[i + d] - n[i])
+
+    def value(self) -> float:
+        heights = self._heights
+        if len(heights) < 5:
+            # Too few samples for markers; heights holds them sorted.
+            return percentile(heights, self.q * 100)
+        return heights[2]
+
+
+class LatencySketch:
+    """Observation count plus streaming p50/p95 estimates for one metric.
+
+    Each sketch carries its own lock so metrics are updated independently.
+    """
+
+    __slots__ = ("lock", "count", "p50", "p95")
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.count = 0
+        self.p50 = P2Quantile(0.5)
+        self.p95 = P2Quantile(0.95)
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        self.p50.add(value)
+        self.p95.add(value)
 
 
 class MetricsCollector:
-    """Tracks counters and latency histograms for the service."""
+    """Tracks counters and latency histograms for the service.
+
+    Locks are sharded per metric: updates to different metrics never contend,
+    and the registration lock is only taken the first time a name is seen.
+    Summaries are snapshotted for ``summary_ttl_seconds`` so frequent readers
+    (scrapes, admin polling) do not contend with writers.
+    """
 
-    def __init__(self, latency_window: int = 500) -> None:
-        self._lock = threading.Lock()
+    def __init__(self, summary_ttl_seconds: float = 1.0) -> None:
+        self.summary_ttl_seconds = summary_ttl_seconds
+        self._summary_cache: Dict[str, Tuple[float, Dict[str, float]]] = {}
+        self._registration_lock = threading.Lock()
+        self._counter_locks: Dict[str, threading.Lock] = {}
         self.counters: Dict[str, int] = defaultdict(int)
-        self.latencies: Dict[str, Deque[float]] = defaultdict(
-            lambda: deque(maxlen=latency_window)
-        )
+        self.latencies: Dict[str, LatencySketch] = {}
+
+    def _counter_lock(self, name: str) -> threading.Lock:
+        lock = self._counter_locks.get(name)
+        if lock is None:
+            with self._registration_lock:
+                lock = self._counter_locks.setdefault(name, threading.Lock())
+        return lock
+
+    def _sketch(self, name: str) -> LatencySketch:
+        sketch = self.latencies.get(name)
+        if sketch is None:
+            with self._registration_lock:
+                sketch = self.latencies.setdefault(name, LatencySketch())
+        return sketch
 
     def increment(self, name: str, value: int = 1) -> None:
-        with self._lock:
+        with self._counter_lock(name):
             self.counters[name] += value
 
     def observe_latency(self, name: str, value: float) -> None:
-        with self._lock:
-            self.latencies[name].append(value)
+        sketch = self._sketch(name)
+        with sketch.lock:
+            sketch.add(value)
 
     def summary(self, name: str) -> Dict[str, float]:
-        with self._lock:
-            values: Iterable[float] = list(self.latencies[name])
-        if not values:
+        now = time.monotonic()
+        cached = self._summary_cache.get(name)
+        if cached is not None and now - cached[0] < self.summary_ttl_seconds:
+            return dict(cached[1])
+        sketch = self.latencies.get(name)
+        if sketch is None:
             return {"count": 0, "p50": 0.0, "p95": 0.0}
-        sorted_values: List[float] = sorted(values)
-        return {
-            "count": len(sorted_values),
-            "p50": percentile(sorted_values, 50),
-            "p95": percentile(sorted_values, 95),
-        }
+        with sketch.lock:
+            if not sketch.count:
+                return {"count": 0, "p50": 0.0, "p95": 0.0}
+            result = {
+                "count": sketch.count,
+                "p50": sketch.p50.value(),
+                "p95": sketch.p95.value(),
+            }
+        self._summary_cache[name] = (now, result)
+        return dict(result)
 
 
 def percentile(values: List[float], q: float) -> float:
@@ -51,4 +169,4 @@ def percentile(values: List[float], q: float) -> float:
     return d0 + d1
 
 
-__all__ = ["MetricsCollector", "percentile"]
+__all__ = ["MetricsCollector", "LatencySketch", "P2Quantile", "percentile"]
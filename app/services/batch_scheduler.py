@@ -4,33 +4,66 @@ Aggregates individual requests into batches to maximize GPU utilization.
 """
 import asyncio
 import time
+from collections import deque
 from dataclasses import dataclass
-from typing import Any, Callable, Dict, List, Optional
+from typing import Any, Callable, Deque, Dict, List, Optional, Union
+
+import numpy as np
 
 from app.monitoring.logger import logger
 
 
 @dataclass
 class _QueueItem:
-    features: Dict[str, Any]
+    features: Any  # list of feature dicts, or their packed matrix when pack_fn is set
+    size: int  # number of rows, used to slice results back out of the batch
     future: asyncio.Future
     received_at: float
+    version: Optional[str] = None  # model version the request was resolved to
+
+
+class _Batch:
+    """Queue entries collected for one prediction call, with their row count."""
+
+    __slots__ = ("items", "rows", "version")
+
+    def __init__(self, first: _QueueItem) -> None:
+        self.items: List[_QueueItem] = [first]
+        self.rows = first.size
+        self.version = first.version
+
+    def add(self, item: _QueueItem) -> None:
+        self.items.append(item)
+        self.rows += item.size
 
 
 class BatchScheduler:
-    """Aggregates individual requests into batches for efficient processing."""
+    """Aggregates individual requests into batches for efficient processing.
+
+    Each ``predict`` call is one queue entry. A batch holds entries for a
+    single model version and up to ``max_batch_size`` rows; a larger entry
+    runs as a batch of its own.
+    """
 
     def __init__(
         self,
-        prediction_fn: Callable[[List[Dict[str, Any]]], List[Dict[str, Any]]],
+        prediction_fn: Callable[[Any, Optional[str]], List[Dict[str, Any]]],
         max_batch_size: int = 32,
         max_latency_ms: float = 10.0,
         max_queue_size: int = 1024,
+        pack_fn: Optional[Callable[[List[Dict[str, Any]], Optional[str]], np.ndarray]] = None,
     ) -> None:
         self.prediction_fn = prediction_fn
+        self.pack_fn = pack_fn
         self.max_batch_size = max_batch_size
         self.max_latency = max_latency_ms / 1000.0  # Convert to seconds
-        self.queue: asyncio.Queue[_QueueItem] = asyncio.Queue(maxsize=max_queue_size)
+        self.max_queue_size = max_queue_size
+        # Not deque(maxlen=...): that would silently drop the oldest request.
+        self._pending: Deque[_QueueItem] = deque()
+        self._wakeup = asyncio.Event()
+        self._deadline_passed = False
+        # An entry for another version that ended the previous batch.
+        self._carry: Optional[_QueueItem] = None
         self._shutdown = False
         self._worker_task: Optional[asyncio.Task] = None
 
@@ -51,76 +84,124 @@ class BatchScheduler:
                 pass
             logger.info("BatchScheduler stopped")
 
-    async def predict(self, features: Dict[str, Any]) -> Dict[str, Any]:
-        """Submit a single request to the batch queue and await result."""
+    async def predict(
+        self,
+        features: Union[Dict[str, Any], List[Dict[str, Any]]],
+        version: Optional[str] = None,
+    ) -> Union[Dict[str, Any], List[Dict[str, Any]]]:
+        """Submit a row (dict) or rows (list) as one queue entry and await the result.
+
+        Returns a single prediction for a dict and a list of predictions for a list.
+        """
+        single = isinstance(features, dict)
+        rows = [features] if single else features
+        if not rows:
+            return []
+        payload = self.pack_fn(rows, version) if self.pack_fn is not None else rows
         loop = asyncio.get_running_loop()
         future = loop.create_future()
-        item = _QueueItem(features=features, future=future, received_at=time.time())
+        item = _QueueItem(
+            features=payload, size=len(rows), future=future, received_at=time.time(), version=version
+        )
 
-        try:
-            self.queue.put_nowait(item)
-        except asyncio.QueueFull:
-            future.cancel()
-            raise  # Caller must handle asyncio.QueueFull
-        try:
-            return await future
-        except Exception:
-            # If the future failed or was cancelled
-            raise
+        if len(self._pending) >= self.max_queue_size:
+            raise asyncio.QueueFull  # Caller must handle asyncio.QueueFull
+        self._pending.append(item)
+        self._wakeup.set()
+        predictions = await future
+        return predictions[0] if single else predictions
 
     async def _worker_loop(self) -> None:
         """Continuously process batches from the queue."""
         while not self._shutdown:
-            batch_items: List[_QueueItem] = []
-
             # 1. Wait for the first item (blocking)
-            try:
-                first_item = await self.queue.get()
-                batch_items.append(first_item)
-            except asyncio.CancelledError:
-                break
-
-            # 2. Collect more items up to max_batch_size, within time window
-            # We enforce the deadline based on the OLDEST item in the batch
-            # BUT if we are already behind (queue is backed up), we should prioritize throughput
-            # and fill the batch via non-blocking gets.
-            deadline = first_item.received_at + self.max_latency
-            
-            while len(batch_items) < self.max_batch_size:
-                now = time.time()
-                remaining = deadline - now
-                
+            first_item, self._carry = self._carry, None
+            if first_item is None:
                 try:
-                    if remaining > 0:
-                        # Wait for next item with timeout
-                        item = await asyncio.wait_for(self.queue.get(), timeout=remaining)
-                        batch_items.append(item)
-                    else:
-                        # Deadline exceeded: Check if we can grab items immediately to fill batch
-                        # This improves throughput under load.
-                        item = self.queue.get_nowait()
-                        batch_items.append(item)
-                except (asyncio.TimeoutError, asyncio.CancelledError, asyncio.QueueEmpty):
+                    first_item = await self._next_item()
+                except asyncio.CancelledError:
                     break
+            batch = _Batch(first_item)
+
+            # 2. Drain whatever is already queued without yielding to the event
+            # loop, so a backed-up queue fills the batch in one wakeup.
+            self._drain_nowait(batch)
+
+            # 3. Top up the batch within the time window.
+            # We enforce the deadline based on the OLDEST item in the batch,
+            # with one timer armed per batch that wakes the worker.
+            remaining = first_item.received_at + self.max_latency - time.time()
+            if batch.rows < self.max_batch_size and remaining > 0 and self._carry is None:
+                try:
+                    await self._fill_until_deadline(batch, remaining)
+                except asyncio.CancelledError:
+                    pass
                 except Exception as e:
                     logger.error(f"Unexpected error in batch loop: {e}")
-                    break
 
-            # 3. Process the batch
-            if batch_items:
-                await self._process_batch(batch_items)
+            # 4. Process the batch
+            await self._process_batch(batch)
+
+    def _offer(self, batch: _Batch, item: _QueueItem) -> bool:
+        """Add ``item`` to the batch, or carry it over if its version differs."""
+        if item.version != batch.version:
+            self._carry = item
+            return False
+        batch.add(item)
+        return True
+
+    async def _next_item(self) -> _QueueItem:
+        while not self._pending:
+            self._wakeup.clear()
+            await self._wakeup.wait()
+        return self._pending.popleft()
 
-    async def _process_batch(self, items: List[_QueueItem]) -> None:
-        """Run prediction and resolve futures."""
-        features = [item.features for item in items]
+    def _drain_nowait(self, batch: _Batch) -> None:
+        pending = self._pending
+        while batch.rows < self.max_batch_size and pending:
+            if not self._offer(batch, pending.popleft()):
+                return
+
+    def _expire_deadline(self) -> None:
+        self._deadline_passed = True
+        self._wakeup.set()
+
+    async def _fill_until_deadline(self, batch: _Batch, timeout: float) -> None:
+        """Add items to the batch until it is full or ``timeout`` elapses."""
+        self._deadline_passed = False
+        timer = asyncio.get_running_loop().call_later(timeout, self._expire_deadline)
+        try:
+            while batch.rows < self.max_batch_size:
+                if not self._pending:
+                    self._wakeup.clear()
+                    await self._wakeup.wait()
+                self._drain_nowait(batch)
+                if self._carry is not None or self._deadline_passed:
+                    return
+        finally:
+            timer.cancel()
+
+    async def _process_batch(self, batch: _Batch) -> None:
+        """Run prediction and slice results back to each entry's future."""
+        items = batch.items
         try:
+            if self.pack_fn is None:
+                features = [row for item in items for row in item.features]
+            elif len(items) == 1:
+                features = items[0].features
+            else:
+                # Concatenate (F, n) views and transpose: one copy, column-major.
+                features = np.concatenate([item.features.T for item in items], axis=1).T
             # Offload blocking prediction_fn to thread
-            predictions = await asyncio.to_thread(self.prediction_fn, features)
-            
+            predictions = await asyncio.to_thread(self.prediction_fn, features, batch.version)
+
             # Map results back to futures
-            for item, prediction in zip(items, predictions):
+            offset = 0
+            for item in items:
+                end = offset + item.size
                 if not item.future.done():
-                    item.future.set_result(prediction)
+                    item.future.set_result(predictions[offset:end])
+                offset = end
         except Exception as e:
             logger.exception("Batch prediction failed")
             # Fail all futures in this batch
@@ -0,0 +1,43 @@
+"""Process-pool entry points for offline batch jobs.
+
+With ``BATCH_BACKEND=process`` the JobManager runs batch jobs in worker
+processes so they use their own interpreter (and GIL) instead of competing
+with the online path. Each worker builds a private registry once in
+``init_worker`` and keeps the default model resident; ``run_batch`` is a
+module-level function so it pickles by reference.
+"""
+from __future__ import annotations
+
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from app.models.registry import ModelRegistry
+
+_registry: Optional[ModelRegistry] = None
+
+
+def init_worker(registry_path: str, default_version: str, simulate_latency: bool = False) -> None:
+    """Build this process's registry and load the default model."""
+
+    global _registry
+    _registry = ModelRegistry(
+        registry_path=Path(registry_path),
+        default_version=default_version,
+        simulate_latency=simulate_latency,
+    )
+    _registry.load(default_version)
+
+
+def run_batch(version: str, features: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Score ``features`` with ``version``; same payload as the thread backend."""
+
+    if _registry is None:
+        raise RuntimeError("Batch worker used before init_worker()")
+    start = time.monotonic()
+    predictions = _registry.load(version).predict(features)
+    latency = time.monotonic() - start
+    return {"predictions": predictions, "version": version, "latency_ms": latency * 1000}
+
+
+__all__ = ["init_worker", "run_batch"]
@@ -1,6 +1,7 @@
 """
 Circuit breaker pattern to protect against cascading failures.
 """
+import itertools
 import time
 from enum import Enum
 from threading import RLock
@@ -34,7 +35,8 @@ class CircuitBreaker:
         self.expected_exception_types = expected_exception_types
 
         self._state = CircuitState.CLOSED
-        self._failure_count = 0
+        self._failures = itertools.count(1)
+        self._failure_count = 0  # last value drawn from _failures
         self._last_failure_time = 0.0
         self._lock = RLock()
 
@@ -43,6 +45,10 @@ class CircuitBreaker:
         return self._state.value
 
     def __enter__(self) -> None:
+        # Fast path: reading _state is atomic under the GIL, and CLOSED needs
+        # no bookkeeping on entry, so the common case skips the lock.
+        if self._state is CircuitState.CLOSED:
+            return
         with self._lock:
             if self._state == CircuitState.OPEN:
                 # Check if recovery timeout has passed
@@ -57,24 +63,41 @@ class CircuitBreaker:
             # (Logic handled in __exit__)
 
     def __exit__(self, exc_type, exc_val, exc_tb) -> bool:
-        with self._lock:
-            if exc_type is not None:
-                # A failure occurred
-                if issubclass(exc_type, self.expected_exception_types):
-                    self._handle_failure()
-                # Do not suppress the exception
+        if exc_type is None:
+            if self._state is CircuitState.CLOSED:
+                # Success while closed only clears a failure streak, which is
+                # two plain stores; a racing failure can at worst be forgotten.
+                if self._failure_count:
+                    self._reset_failures()
                 return False
-            
-            # Success
-            self._handle_success()
+            with self._lock:
+                self._handle_success()
             return False
 
-    def _handle_failure(self) -> None:
-        self._failure_count += 1
+        if not issubclass(exc_type, self.expected_exception_types):
+            # Do not suppress the exception
+            return False
         self._last_failure_time = time.time()
-        
+        if self._state is CircuitState.CLOSED:
+            # next() on itertools.count is one C call, so concurrent failures
+            # are all counted without the lock; only the one that reaches the
+            # threshold takes it to open the circuit.
+            failures = self._failure_count = next(self._failures)
+            if failures < self.failure_threshold:
+                return False
+        with self._lock:
+            self._handle_failure()
+        return False
+
+    def _reset_failures(self) -> None:
+        self._failures = itertools.count(1)
+        self._failure_count = 0
+
+    def _handle_failure(self) -> None:
+        # Called with the lock held; failures while CLOSED are already counted.
         if self._state == CircuitState.HALF_OPEN:
             # Failed trial -> Re-open immediately
+            self._failure_count = next(self._failures)
             self._transition_to(CircuitState.OPEN)
         elif self._state == CircuitState.CLOSED:
             if self._failure_count >= self.failure_threshold:
@@ -84,14 +107,7 @@ class CircuitBreaker:
         if self._state == CircuitState.HALF_OPEN:
             # Trial succeeded -> Close circuit
             self._transition_to(CircuitState.CLOSED)
-            self._failure_count = 0
-        elif self._state == CircuitState.CLOSED:
-            # Reset failure count on success? 
-            # Classic pattern: simple count reset, or rolling window.
-            # For simplicity: reset on success is generous (good for intermittent).
-            # Alternatively: only reset if failure_count > 0.
-            if self._failure_count > 0:
-                self._failure_count = 0
+            self._reset_failures()
 
     def _transition_to(self, new_state: CircuitState) -> None:
         if self._state != new_state:
@@ -2,41 +2,104 @@
 from __future__ import annotations
 
 import asyncio
+import hashlib
+import logging
+import math
 import time
-from typing import Any, Dict, List, Optional
+from contextlib import nullcontext
+from itertools import chain
+from operator import itemgetter
+from typing import Any, Callable, ContextManager, Dict, List, Optional, Tuple
 
+import numpy as np
+import orjson
+
+from app.models.base import InvalidFeaturesError, Model
 from app.models.registry import ModelRegistry
 from app.monitoring.drift import DriftTracker
 from app.monitoring.logger import logger
 from app.monitoring.metrics import MetricsCollector
 from app.services.batch_scheduler import BatchScheduler
+from app.services.batch_worker import run_batch
 from app.services.circuit_breaker import CircuitBreaker
 from app.services.job_manager import JobManager
+from app.services.priority_lock import PriorityLock
+from app.services.response_cache import ResponseCache
 from app.utils.config import AppSettings
 
 
+# Bound on distinct request schemas remembered by ``_numeric_matrix``.
+_MAX_CACHED_SCHEMAS = 64
+_NUMERIC_TYPES = frozenset((int, float, bool))
 
 
-class InferenceService:
-    def load_model(self, version: str) -> None:
-        """Load a model version into memory."""
-        self.registry.load(version)
+class _Schema:
+    """Numeric and non-numeric columns of a request schema, with row getters."""
 
-    def unload_model(self, version: str) -> None:
-        """Unload a model version from memory."""
-        self.registry.unload(version)
+    __slots__ = ("names", "numeric", "other")
 
-    def promote_model(self, version: str) -> None:
-        """Set a model version as the default."""
-        self.registry.set_default_version(version)
+    def __init__(self, row: Dict[str, Any]) -> None:
+        self.names = [k for k, v in row.items() if isinstance(v, (int, float))]
+        others = [k for k in row if k not in self.names]
+        self.numeric = _row_getter(self.names)
+        self.other = _row_getter(others) if others else None
+
+
+def _row_getter(keys: List[str]) -> Callable[[Dict[str, Any]], Tuple[Any, ...]]:
+    getter = itemgetter(*keys) if keys else (lambda row: ())
+    if len(keys) == 1:
+        return lambda row: (getter(row),)
+    return getter
 
-    def list_models(self) -> Dict[str, Any]:
-        """List loaded models and current default."""
-        return {
-            "loaded_versions": self.registry.list_loaded_versions(),
-            "default_version": self.registry.default_version,
-        }
 
+def _numeric_matrix(
+    features: List[Dict[str, Any]],
+    schema_cache: Optional[Dict[frozenset, _Schema]] = None,
+) -> Tuple[List[str], np.ndarray]:
+    """Return the numeric feature names in a request and an (N, F) value matrix.
+
+    Cells that are missing or non-numeric are NaN. When every row has the
+    first row's keys, its columns are split into numeric and other once per
+    key set (memoized in ``schema_cache``) and the matrix is built with
+    C-level gathers and a per-type check instead of per-cell ``isinstance``;
+    rows that do not fit that schema fall back to the per-cell path.
+    """
+    if features:
+        first = features[0]
+        key_set = frozenset(first)
+        schema = schema_cache.get(key_set) if schema_cache is not None else None
+        if schema is None:
+            schema = _Schema(first)
+            if schema_cache is not None:
+                if len(schema_cache) >= _MAX_CACHED_SCHEMAS:
+                    schema_cache.clear()
+                schema_cache[key_set] = schema
+        if all(row.keys() == key_set for row in features):
+            flat = list(chain.from_iterable(map(schema.numeric, features)))
+            others = chain.from_iterable(map(schema.other, features)) if schema.other else ()
+            # Exact types only: subclasses, strings or None take the slow path,
+            # as does a column that is numeric in a later row but not the first.
+            if _NUMERIC_TYPES.issuperset(map(type, flat)) and _NUMERIC_TYPES.isdisjoint(
+                map(type, others)
+            ):
+                values = np.array(flat, dtype=np.float64).reshape(len(features), len(schema.names))
+                return schema.names, values
+
+    names = list(dict.fromkeys(chain.from_iterable(features)))
+    values = np.array(
+        [
+            [v if isinstance(v := row.get(name), (int, float)) else math.nan for name in names]
+            for row in features
+        ],
+        dtype=np.float64,
+    ).reshape(len(features), len(names))
+    numeric = ~np.isnan(values).all(axis=0)
+    if numeric.all():
+        return names, values
+    return [name for name, keep in zip(names, numeric) if keep], values[:, numeric]
+
+
+class InferenceService:
     def __init__(
         self,
         settings: AppSettings,
@@ -52,6 +115,22 @@ class InferenceService:
         self.job_manager = job_manager
         
 
+        # Identical small requests to a deterministic model are served from cache
+        self.response_cache = ResponseCache(
+            maxsize=settings.response_cache_size,
+            ttl_seconds=settings.response_cache_ttl_seconds,
+        )
+        # Read on every request; bound once instead of via self.settings.
+        self._cache_max_instances = settings.response_cache_max_instances
+        self.health_ttl_seconds = 1.0
+        self._health_cache: Tuple[float, Optional[Dict[str, Any]]] = (0.0, None)
+        # Numeric drift columns per request key set; see _numeric_matrix.
+        self._drift_schemas: Dict[frozenset, _Schema] = {}
+
+        # Serializes calls into models with exclusive_device set; online
+        # requests take priority over batch jobs
+        self.device_lock = PriorityLock()
+
         # Circuit breaker for model protection
         self.breaker = CircuitBreaker(failure_threshold=5, recovery_timeout=5.0)
         
@@ -61,97 +140,212 @@ class InferenceService:
             max_batch_size=32,
             max_latency_ms=10.0,
             max_queue_size=1024,
+            pack_fn=self._pack_features,
         )
 
     def start(self) -> None:
-        """Start the batch scheduler."""
+        """Warm up and preload models, then start the batch scheduler."""
+        self.warmup()
+        self.preload()
         self.scheduler.start()
 
+    def preload(self) -> None:
+        """Load ``settings.preload_versions`` before any traffic.
+
+        Versions are listed highest priority first. The default version is
+        always resident, so at most ``max_loaded_models - 1`` others are
+        loaded; lower-priority versions beyond that are skipped (and logged)
+        rather than evicting higher-priority ones. Load failures are logged only.
+        """
+        default_version = self.registry.default_version
+        versions = [
+            v for v in dict.fromkeys(self.settings.preload_versions) if v != default_version
+        ]
+        capacity = max(self.registry.max_loaded_models - 1, 0)
+        if len(versions) > capacity:
+            logger.warning(
+                "Skipping preload beyond max_loaded_models",
+                extra={"ctx_skipped_versions": versions[capacity:]},
+            )
+            versions = versions[:capacity]
+        for version in versions:
+            try:
+                self.registry.load(version)
+            except Exception:  # noqa: BLE001
+                logger.exception("Model preload failed", extra={"ctx_version": version})
+
+    def warmup(self) -> None:
+        """Load the default model and score dummy batches through it.
+
+        Moves the artifact load and first-call costs (kernel compilation,
+        allocator growth) from the first request to startup. A single row
+        and a full batch are scored separately: a one-row matrix is both C-
+        and F-contiguous, so JIT kernels specialize it apart from larger
+        batches. Failures are logged, not raised, so the service still
+        starts and reports them through the normal request path.
+        """
+        version = self.registry.default_version
+        try:
+            model = self.registry.load(version)
+            row = dict.fromkeys(model.metadata().get("features", []), 0.0)
+            model.predict([row])
+            model.predict([row] * max(2, self.scheduler.max_batch_size))
+        except Exception:  # noqa: BLE001
+            logger.exception("Model warmup failed", extra={"ctx_version": version})
+
     async def stop(self) -> None:
-        """Stop the batch scheduler."""
+        """Stop the batch scheduler and release the job workers."""
         await self.scheduler.stop()
+        self.job_manager.shutdown(wait=False)
+
+    def load_model(self, version: str) -> None:
+        """Load a model version into memory."""
+        self.registry.load(version)
 
-    def _run_batch_prediction(self, features: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    def unload_model(self, version: str) -> None:
+        """Unload a model version from memory."""
+        self.registry.unload(version)
+        # A reload may pick up a different artifact under the same version.
+        self.response_cache.clear()
+
+    def promote_model(self, version: str) -> None:
+        """Set a model version as the default."""
+        self.registry.set_default_version(version)
+
+    def list_models(self) -> Dict[str, Any]:
+        """List loaded models and current default."""
+        return {
+            "loaded_versions": self.registry.list_loaded_versions(),
+            "default_version": self.registry.default_version,
+        }
+
+    def _pack_features(self, features: List[Dict[str, Any]], version: str) -> np.ndarray:
+        """Pack one request's rows for the scheduler using ``version``'s schema."""
+        return self.registry.load(version).pack(features)
+
+    def _run_batch_prediction(self, features: np.ndarray, version: str) -> List[Dict[str, Any]]:
         """Internal callback for batch scheduler to run prediction on a batch."""
         # Use circuit breaker to protect the model call
         with self.breaker:
-            return self._unsafe_run_batch_prediction(features)
+            return self._unsafe_run_batch_prediction(features, version)
 
-    def _unsafe_run_batch_prediction(self, features: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        # This runs in a thread pool managed by the scheduler (via to_thread)
-        # Use dynamic default version from registry
-        version = self.registry.default_version
+    def _run_direct_prediction(self, features: List[Dict[str, Any]], version: str) -> List[Dict[str, Any]]:
+        """Score a request that fills a micro-batch on its own, bypassing the scheduler."""
+        return self._run_batch_prediction(self._pack_features(features, version), version)
+
+    def _run_online_prediction(self, version: str, features: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        with self.registry.lease(version) as model, self._device(model, high_priority=True):
+            return model.predict(features)
+
+    def _device(self, model: Model, high_priority: bool) -> ContextManager[None]:
+        """Hold the device lock only for models that need exclusive device access."""
+        if model.exclusive_device:
+            return self.device_lock.hold(high_priority)
+        return nullcontext()
+
+    def _unsafe_run_batch_prediction(self, features: np.ndarray, version: str) -> List[Dict[str, Any]]:
+        # This runs in a thread pool managed by the scheduler (via to_thread).
+        # ``version`` is the one the batch's requests were packed for.
         try:
-            model = self.registry.load(version)
-            predictions = model.predict(features)
-            return predictions
+            with self.registry.lease(version) as model, self._device(model, high_priority=True):
+                return model.predict_packed(features)
         except Exception:
             logger.exception("Batch prediction execution failed")
             raise
 
     async def predict(self, features: List[Dict[str, Any]], model_version: Optional[str] = None) -> Dict[str, Any]:
-        version = model_version or self.registry.default_version
         start = time.monotonic()
+        # Snapshot the default once: the request is packed, batched and scored
+        # with this version even if a promotion lands meanwhile.
+        default_version = self.registry.default_version
+        version = model_version or default_version
         self.metrics.increment("request_total")
         
         # Use batch scheduler ONLY if:
         # 1. It is the default model (our scheduler is single-model for now)
         # 2. We are not forcing a specific version that differs
-        # Note: If default_version changes while we are here, we might have a race,
-        # but 'version' variable captures it for this request.
-        use_batching = (model_version is None) or (model_version == self.registry.default_version)
+        use_batching = (model_version is None) or (model_version == default_version)
+
+        cache_key = self._response_cache_key(version, features)
+        predictions = self.response_cache.get(cache_key) if cache_key is not None else None
+        cache_hit = predictions is not None
 
         try:
-            if use_batching:
-                # Disaggregate input: The current API accepts a LIST of features (batch request).
-                # But the scheduler accepts single items or we change scheduler to accept chunks?
-                # My BatchScheduler.predict accepts 'features: Dict[str, Any]'.
-                # But the API input 'features' is List[Dict].
-                # If the user sends a batch of 10 items, we should ideally keep them together 
-                # or split them.
-                # If we split them, we have to wait for all futures.
-                
-                # For simplicity, let's map the input list to multiple scheduler calls.
-                tasks = [self.scheduler.predict(f) for f in features]
-                predictions = await asyncio.gather(*tasks)
+            if cache_hit:
+                self.metrics.increment("response_cache_hits")
+            elif use_batching and len(features) >= self.scheduler.max_batch_size:
+                # Already a full batch: queueing it would only add a hop and
+                # make it wait behind other micro-batches. Pack and score in
+                # a worker thread, off the event loop.
+                predictions = await asyncio.to_thread(self._run_direct_prediction, features, version)
+            elif use_batching:
+                # The whole request is one scheduler entry; results come back
+                # sliced to this request's rows.
+                predictions = await self.scheduler.predict(features, version)
             else:
                 # Legacy/Specific version path (sync -> thread pool via fastapi or local)
                 # Since this function is async, we shouldn't block loop.
                 # Run in executor.
-                model = self.registry.load(version)
-                predictions = await asyncio.to_thread(model.predict, features)
+                predictions = await asyncio.to_thread(self._run_online_prediction, version, features)
 
+        except InvalidFeaturesError:
+            # A client error: no traceback, and the model was never run.
+            self.metrics.increment("errors")
+            raise
         except Exception as exc:  # noqa: BLE001
             self.metrics.increment("errors")
             logger.exception("Failed to load/run model", extra={"ctx_version": version})
             raise
 
+        if cache_key is not None and not cache_hit:
+            self.response_cache.put(cache_key, predictions)
+
         latency = time.monotonic() - start
         self.metrics.observe_latency("inference_latency", latency)
-        logger.info(
-            "prediction completed",
-            extra={
-                "ctx_version": version,
-                "ctx_latency_ms": int(latency * 1000),
-                "ctx_num_records": len(features),
-            },
-        )
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(
+                "prediction completed",
+                extra={
+                    "ctx_version": version,
+                    "ctx_latency_ms": int(latency * 1000),
+                    "ctx_num_records": len(features),
+                },
+            )
         
         # Async drift tracking (fire and forget or await?)
         # Logging/metrics are fast. Drift tracking might compute things.
         # Let's keep it inline for now or make it a background task.
-        for row in features:
-            signals = self.drift_tracker.update({k: float(v) for k, v in row.items() if isinstance(v, (int, float))})
-            for signal in signals:
-                logger.warning(
-                    "drift detected",
-                    extra={
-                        "ctx_feature": signal.feature,
-                        "ctx_drift_score": signal.drift_score,
-                    },
-                )
+        names, values = _numeric_matrix(features, self._drift_schemas)
+        scores = self.drift_tracker.score_array(values, names)
+        # Usually empty: Python only touches the features that drifted.
+        drifting = np.flatnonzero(scores >= self.drift_tracker.threshold)
+        if drifting.size and logger.isEnabledFor(logging.WARNING):
+            # One record per request rather than one per drifting feature.
+            logger.warning(
+                "drift detected",
+                extra={
+                    "ctx_signals": [
+                        {"feature": names[j], "drift_score": float(scores[j])} for j in drifting
+                    ],
+                },
+            )
         return {"predictions": predictions, "version": version, "latency_ms": latency * 1000}
 
+    def _response_cache_key(self, version: str, features: List[Dict[str, Any]]) -> Optional[tuple]:
+        """Return a cache key for small requests, or None if not cacheable.
+
+        Only small batches are cached so the hit rate stays meaningful. The
+        canonical body is hashed to a fixed-size digest, so key memory does
+        not grow with request size.
+        """
+        if not self.response_cache.enabled or len(features) > self._cache_max_instances:
+            return None
+        try:
+            body = orjson.dumps(features, option=orjson.OPT_SORT_KEYS)
+        except TypeError:
+            return None
+        return (version, hashlib.blake2b(body, digest_size=16).digest())
+
     def enqueue_batch(self, features: List[Dict[str, Any]], model_version: Optional[str] = None) -> str:
         # job_manager is sync (ThreadPollExecutor). 
         # But now predict is async. JobManager.submit takes a function.
@@ -159,6 +353,10 @@ class InferenceService:
         # Or just have JobManager run a sync wrapper "run_async(predict...)"?
         # Easier: Keep JobManager for "offline batch" which bypasses the online scheduler.
         # So we define a new sync helper for the job manager.
+        if self.job_manager.backend == "process":
+            # Resolve the version here: worker registries never see promotions.
+            version = model_version or self.registry.default_version
+            return self.job_manager.submit(run_batch, version, features)
         return self.job_manager.submit(self._predict_sync, features, model_version)
         
     def _predict_sync(self, features: List[Dict[str, Any]], model_version: Optional[str] = None) -> Dict[str, Any]:
@@ -167,28 +365,25 @@ class InferenceService:
         # because the job IS a big batch. We can just run it directly.
         # Also JobManager runs in a separate thread.
         version = model_version or self.registry.default_version
-        model = self.registry.load(version)
-        
-        # Chunking: Split large batch into smaller chunks to release lock periodically
-        # This prevents locking the GPU for too long, allowing online requests to interleave.
-        chunk_size = 8
-        all_predictions = []
-        
-        start = time.monotonic()
-        for i in range(0, len(features), chunk_size):
-            chunk = features[i : i + chunk_size]
-            # model.predict acquires the lock for (Base + ChunkSize) duration
-            # With chunk_size=32, this is ~42ms.
-            # Between chunks, the lock is released, allowing online traffic to grab it.
-            chunk_predictions = model.predict(chunk)
-            all_predictions.extend(chunk_predictions)
-            
-            # Optional: Short sleep to force yield? 
-            # In threading, releasing lock is usually enough for others to grab it 
-            # if they are waiting.
-            # UPDATE: Lock is not fair. We must sleep to let the scheduler thread grab it.
-            time.sleep(0.05)
-        
+        with self.registry.lease(version) as model:
+            start = time.monotonic()
+            if not model.exclusive_device:
+                # Nothing to share: score the whole job in one call, concurrently
+                # with online traffic and other jobs.
+                all_predictions = model.predict(features)
+            else:
+                # Chunking: Split large batch into smaller chunks so online requests can
+                # interleave. The job holds the device lock at low priority and only
+                # hands it over between chunks when online requests are waiting.
+                # Jobs on an exclusive device therefore run one at a time.
+                chunk_size = 8
+                all_predictions = []
+                with self.device_lock.hold(high_priority=False):
+                    for i in range(0, len(features), chunk_size):
+                        chunk = features[i : i + chunk_size]
+                        all_predictions.extend(model.predict(chunk))
+                        self.device_lock.yield_if_contended()
+
         latency = time.monotonic() - start
         return {"predictions": all_predictions, "version": version, "latency_ms": latency * 1000}
 
@@ -201,16 +396,28 @@ class InferenceService:
         return payload
 
     def health(self) -> Dict[str, Any]:
+        """Report readiness, reusing the last answer for ``health_ttl_seconds``.
+
+        Probes arrive every few seconds from each kubelet/load balancer; a
+        degraded model would otherwise retry a disk load on every one.
+        """
+        now = time.monotonic()
+        checked_at, cached = self._health_cache
+        if cached is not None and now - checked_at < self.health_ttl_seconds:
+            return dict(cached)
+        settings = self.settings
         try:
-            self.registry.load(self.settings.default_model_version)
+            self.registry.load(settings.default_model_version)
             status = "ready"
         except Exception:
             status = "degraded"
-        return {
+        payload = {
             "status": status,
-            "default_model": self.settings.default_model_version,
-            "env": self.settings.env,
+            "default_model": settings.default_model_version,
+            "env": settings.env,
         }
+        self._health_cache = (now, payload)
+        return dict(payload)
 
 
 __all__ = ["InferenceService"]
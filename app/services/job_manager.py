@@ -1,29 +1,92 @@
 import concurrent.futures
 import json
-import uuid
+import multiprocessing
 import os
+import secrets
+import threading
 import time
+from collections import OrderedDict
 from pathlib import Path
-from typing import Any, Dict, List, Optional
-from datetime import datetime
+from typing import Any, Callable, Dict, Optional, Tuple
 
 from app.monitoring.logger import logger
 
 
 class JobManager:
-    def __init__(self, max_workers: int = 2, storage_dir: str = "data/jobs") -> None:
-        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+    """Runs offline jobs on a thread or process pool and persists their state.
+
+    With ``backend="thread"`` jobs share the service's interpreter. With
+    ``backend="process"`` each worker is a separate (spawned) process, so
+    CPU-bound jobs run in parallel with each other and with online traffic;
+    job functions and arguments must then be picklable, and state
+    transitions are recorded in this process from the future's callbacks.
+
+    ``submit`` only records the pending state in memory so callers never
+    wait on disk; the first write happens when a job starts (thread backend)
+    or finishes (process backend). Until then the job is visible to this
+    process only.
+    """
+
+    BACKENDS = ("thread", "process")
+
+    def __init__(
+        self,
+        max_workers: int = 2,
+        storage_dir: str = "data/jobs",
+        max_cached_jobs: int = 1024,
+        backend: str = "thread",
+        initializer: Optional[Callable[..., None]] = None,
+        initargs: Tuple[Any, ...] = (),
+    ) -> None:
+        if backend not in self.BACKENDS:
+            raise ValueError(f"Unknown job backend {backend!r}; expected one of {self.BACKENDS}")
+        self.backend = backend
+        self.executor: concurrent.futures.Executor
+        if backend == "process":
+            # Spawn rather than fork: the parent runs an event loop and
+            # several threads whose locks must not be copied mid-flight.
+            self.executor = concurrent.futures.ProcessPoolExecutor(
+                max_workers=max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=initializer,
+                initargs=initargs,
+            )
+        else:
+            self.executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=max_workers, initializer=initializer, initargs=initargs
+            )
         self.storage_dir = Path(storage_dir)
         self.storage_dir.mkdir(parents=True, exist_ok=True)
+        # Write-through cache of job state: disk stays the source of truth for
+        # other processes and restarts, while status polls are served from RAM.
+        # State dicts are replaced, never mutated, so readers get snapshots.
+        # Only status metadata is cached: ``result`` payloads can be large and
+        # are read back from disk, except while a state is still unpersisted.
+        self.max_cached_jobs = max_cached_jobs
+        self._state_cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._state_lock = threading.Lock()
+        # Jobs whose cached state has not been written yet; never evicted.
+        self._unpersisted: set = set()
+        # st_mtime_ns of the file each disk-loaded cache entry was parsed from.
+        # Those entries may be updated by another process (e.g. another
+        # uvicorn worker), so they are revalidated with a stat() per read;
+        # entries written by this process are authoritative and have none.
+        self._stat_cache: Dict[str, int] = {}
         self._jobs: Dict[str, concurrent.futures.Future] = {} 
         # Note: _jobs only tracks in-memory futures for the current process. 
         # Persistence allows querying old jobs.
 
     def submit(self, fn: Any, *args: Any, **kwargs: Any) -> str:
-        job_id = str(uuid.uuid4())
+        job_id = secrets.token_hex(16)
         
-        # Save initial PENDING state
-        self._save_job_state(job_id, {"status": "pending", "submitted_at": time.time()})
+        # Record initial PENDING state in memory; persisted with the next transition
+        self._save_job_state(job_id, {"status": "pending", "submitted_at": time.time()}, persist=False)
+
+        if self.backend == "process":
+            future = self.executor.submit(fn, *args, **kwargs)
+            self._jobs[job_id] = future
+            future.add_done_callback(lambda f: self._record_outcome(job_id, f))
+            return job_id
 
         # Wrap the function to handle status updates
         def wrapped_fn():
@@ -54,38 +117,114 @@ class JobManager:
         # Or just read disk for SSoT? Disk is safer for consistency.
         state = self._load_job_state(job_id)
         if state:
-            return state.get("status", "unknown")
+            status = state.get("status", "unknown")
+            if status == "pending":
+                # Process workers cannot report when they pick a job up.
+                future = self._jobs.get(job_id)
+                if future is not None and future.running():
+                    return "running"
+            return status
         return "not_found"
 
     def result(self, job_id: str) -> Optional[Any]:
         state = self._load_job_state(job_id)
-        if state and state.get("status") == "completed":
-            return state.get("result")
-        return None
+        if not state or state.get("status") != "completed":
+            return None
+        if "result" in state:
+            return state["result"]
+        state = self._read_job_file(job_id)
+        return state.get("result") if state else None
+
+    def shutdown(self, wait: bool = True) -> None:
+        self.executor.shutdown(wait=wait)
+
+    def _record_outcome(self, job_id: str, future: concurrent.futures.Future) -> None:
+        """Persist the terminal state of a job run by the process backend."""
+        error = future.exception() if not future.cancelled() else concurrent.futures.CancelledError()
+        if error is None:
+            self._save_job_state(job_id, {
+                "status": "completed",
+                "completed_at": time.time(),
+                "result": future.result()
+            })
+            return
+        logger.error("Batch job failed", exc_info=error, extra={"ctx_job_id": job_id})
+        self._save_job_state(job_id, {
+            "status": "failed",
+            "completed_at": time.time(),
+            "error": str(error)
+        })
+
+    def _save_job_state(self, job_id: str, updates: Dict[str, Any], persist: bool = True) -> None:
+        """Update job state in memory and write it through to disk atomically."""
+        with self._state_lock:
+            current_state = self._state_cache.get(job_id)
+            if current_state is None or (
+                current_state.get("status") == "completed" and "result" not in current_state
+            ):
+                current_state = self._read_job_file(job_id) or current_state or {}
+            state = {**current_state, **updates, "updated_at": time.time()}
+            # Pinned in the cache until the file is in place, so readers never
+            # fall through to a disk copy that does not exist yet.
+            self._unpersisted.add(job_id)
+            self._stat_cache.pop(job_id, None)
+            self._cache_state(job_id, state)
+        if not persist:
+            return
 
-    def _save_job_state(self, job_id: str, updates: Dict[str, Any]) -> None:
-        """Update job state on disk."""
         file_path = self.storage_dir / f"{job_id}.json"
-        
-        # Read existing to merge updates (simple lock-free approach, risky if high concurrency on same job, but jobs are sequential)
-        current_state = {}
-        if file_path.exists():
-            try:
-                with open(file_path, "r") as f:
-                    current_state = json.load(f)
-            except Exception:
-                pass
-        
-        current_state.update(updates)
-        current_state["updated_at"] = time.time()
-        
+        tmp_path = self.storage_dir / f"{job_id}.json.tmp"
         try:
-            with open(file_path, "w") as f:
-                json.dump(current_state, f, default=str)
+            with open(tmp_path, "w") as f:
+                json.dump(state, f, default=str)
+            # Readers never observe a partially written file.
+            os.replace(tmp_path, file_path)
         except Exception as e:
             logger.error(f"Failed to save job state: {e}")
+            return
+        with self._state_lock:
+            if self._state_cache.get(job_id) is state:
+                self._unpersisted.discard(job_id)
+                if "result" in state:
+                    self._cache_state(job_id, _metadata(state))
 
     def _load_job_state(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._state_lock:
+            state = self._state_cache.get(job_id)
+            mtime_ns = self._stat_cache.get(job_id)
+            if state is not None:
+                self._state_cache.move_to_end(job_id)
+        if state is not None and mtime_ns is None:
+            return state
+        try:
+            current_mtime_ns = os.stat(self.storage_dir / f"{job_id}.json").st_mtime_ns
+        except OSError:
+            return state
+        if state is not None and current_mtime_ns == mtime_ns:
+            return state
+        state = self._read_job_file(job_id)
+        if state is not None:
+            state = _metadata(state)
+            with self._state_lock:
+                # Never clobber a state this process wrote meanwhile.
+                cached = self._state_cache.get(job_id)
+                if cached is not None and job_id not in self._stat_cache:
+                    return cached
+                self._cache_state(job_id, state)
+                self._stat_cache[job_id] = current_mtime_ns
+        return state
+
+    def _cache_state(self, job_id: str, state: Dict[str, Any]) -> None:
+        self._state_cache[job_id] = state
+        self._state_cache.move_to_end(job_id)
+        while len(self._state_cache) > self.max_cached_jobs:
+            victim = next((k for k in self._state_cache if k not in self._unpersisted), None)
+            if victim is None:
+                break
+            del self._state_cache[victim]
+            self._stat_cache.pop(victim, None)
+
+    def _read_job_file(self, job_id: str) -> Optional[Dict[str, Any]]:
         file_path = self.storage_dir / f"{job_id}.json"
         if not file_path.exists():
             return None
@@ -96,4 +235,10 @@ class JobManager:
             return None
 
 
+def _metadata(state: Dict[str, Any]) -> Dict[str, Any]:
+    """Return ``state`` without its ``result`` payload, for the state cache."""
+
+    return {key: value for key, value in state.items() if key != "result"}
+
+
 __all__ = ["JobManager"]
@@ -0,0 +1,62 @@
+"""
+Two-level priority lock for sharing the model device between online and batch work.
+"""
+import threading
+from contextlib import contextmanager
+from typing import Iterator
+
+
+class PriorityLock:
+    """Mutex where high-priority waiters always go before low-priority ones.
+
+    Online inference acquires with high priority and offline batch jobs with
+    low priority. A low-priority holder working in chunks calls
+    ``yield_if_contended`` between chunks: it hands the lock over only when
+    high-priority callers are actually waiting, instead of sleeping on a timer.
+    """
+
+    def __init__(self) -> None:
+        self._cond = threading.Condition(threading.Lock())
+        self._held = False
+        self._high_waiters = 0
+
+    def acquire(self, high_priority: bool = True) -> None:
+        with self._cond:
+            if high_priority:
+                self._high_waiters += 1
+                try:
+                    while self._held:
+                        self._cond.wait()
+                finally:
+                    self._high_waiters -= 1
+            else:
+                while self._held or self._high_waiters:
+                    self._cond.wait()
+            self._held = True
+
+    def release(self) -> None:
+        with self._cond:
+            self._held = False
+            self._cond.notify_all()
+
+    def yield_if_contended(self) -> None:
+        """Let waiting high-priority callers run, then re-acquire (low priority)."""
+        with self._cond:
+            if not self._high_waiters:
+                return
+            self._held = False
+            self._cond.notify_all()
+            while self._held or self._high_waiters:
+                self._cond.wait()
+            self._held = True
+
+    @contextmanager
+    def hold(self, high_priority: bool = True) -> Iterator[None]:
+        self.acquire(high_priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+
+__all__ = ["PriorityLock"]
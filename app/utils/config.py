@@ -2,10 +2,11 @@
 from dataclasses import dataclass
 from functools import lru_cache
 from pathlib import Path
+from typing import Tuple
 import os
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class AppSettings:
     """Application configuration loaded from environment variables."""
 
@@ -17,6 +18,13 @@ class AppSettings:
     drift_window: int
     drift_threshold: float
     request_timeout_seconds: float
+    simulate_gpu_latency: bool = False
+    max_loaded_models: int = 4
+    response_cache_size: int = 10_000
+    response_cache_ttl_seconds: float = 60.0
+    response_cache_max_instances: int = 4
+    batch_backend: str = "thread"
+    preload_versions: Tuple[str, ...] = ()
 
     @staticmethod
     def from_env() -> "AppSettings":
@@ -29,6 +37,16 @@ class AppSettings:
             drift_window=int(os.getenv("DRIFT_WINDOW", "200")),
             drift_threshold=float(os.getenv("DRIFT_THRESHOLD", "0.15")),
             request_timeout_seconds=float(os.getenv("REQUEST_TIMEOUT_SECONDS", "2.0")),
+            simulate_gpu_latency=os.getenv("SIMULATE_GPU_LATENCY", "false").lower()
+            in {"1", "true", "yes"},
+            max_loaded_models=int(os.getenv("MAX_LOADED_MODELS", "4")),
+            response_cache_size=int(os.getenv("RESPONSE_CACHE_SIZE", "10000")),
+            response_cache_ttl_seconds=float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "60")),
+            response_cache_max_instances=int(os.getenv("RESPONSE_CACHE_MAX_INSTANCES", "4")),
+            batch_backend=os.getenv("BATCH_BACKEND", "thread").lower(),
+            preload_versions=tuple(
+                v.strip() for v in os.getenv("PRELOAD_MODELS", "").split(",") if v.strip()
+            ),
         )
 
 
@@ -1,10 +1,24 @@
+import asyncio
+import json
+import os
+import shutil
+import threading
+import time
 from pathlib import Path
 
+import numpy as np
+import pytest
+
+from app.models.base import InvalidFeaturesError
+from app.models.example_model import ExampleModel
 from app.models.registry import ModelRegistry
 from app.monitoring.drift import DriftTracker
 from app.monitoring.metrics import MetricsCollector
-from app.services.inference_service import InferenceService
+from app.services.inference_service import InferenceService, _numeric_matrix
+from app.services.batch_scheduler import BatchScheduler
+from app.services.circuit_breaker import CircuitBreaker, CircuitBreakerOpen
 from app.services.job_manager import JobManager
+from app.services.priority_lock import PriorityLock
 from app.utils.config import AppSettings
 
 
@@ -28,12 +42,77 @@ def build_service() -> InferenceService:
 
 
 def test_predict_returns_probabilities() -> None:
-    service = build_service()
-    response = service.predict([{"feature_a": 1.0, "feature_b": 0.2}])
+    async def run() -> dict:
+        service = build_service()
+        service.start()
+        try:
+            return await service.predict([{"feature_a": 1.0, "feature_b": 0.2}])
+        finally:
+            await service.stop()
+
+    response = asyncio.run(run())
     assert "predictions" in response
     prediction = response["predictions"][0]
     assert 0.0 <= prediction["probability"] <= 1.0
     assert prediction["version"] == "v1"
+    assert abs(prediction["probability"] - 0.6082590307) < 1e-9
+
+
+def test_null_feature_fails_only_its_own_request() -> None:
+    async def run() -> tuple:
+        service = build_service()
+        service.start()
+        try:
+            return await asyncio.gather(
+                service.predict([{"feature_a": None, "feature_b": 0.2}]),
+                service.predict([{"feature_a": 1.0, "feature_b": 0.2}]),
+                return_exceptions=True,
+            )
+        finally:
+            await service.stop()
+
+    bad, good = asyncio.run(run())
+    assert isinstance(bad, InvalidFeaturesError)
+    assert abs(good["predictions"][0]["probability"] - 0.6082590307) < 1e-6
+
+
+def test_repeated_small_request_is_served_from_cache() -> None:
+    async def run() -> InferenceService:
+        service = build_service()
+        service.start()
+        try:
+            first = await service.predict([{"feature_a": 0.3, "feature_b": 0.1}])
+            second = await service.predict([{"feature_b": 0.1, "feature_a": 0.3}])
+            assert first["predictions"] == second["predictions"]
+        finally:
+            await service.stop()
+        return service
+
+    service = asyncio.run(run())
+    assert service.metrics.counters["response_cache_hits"] == 1
+
+
+def test_response_cache_key_size_does_not_grow_with_body() -> None:
+    service = build_service()
+    padded = [{"feature_a": 0.3, "padding": "x" * 1_000_000}]
+    version, digest = service._response_cache_key("v1", padded)
+    assert version == "v1"
+    assert len(digest) == 16
+    assert service._response_cache_key("v1", padded) == (version, digest)
+
+
+def test_warmup_compiles_single_row_and_batch_layouts() -> None:
+    from app.models import _kernels
+
+    if not _kernels.HAS_NUMBA:
+        pytest.skip("numba is not installed")
+    service = build_service()
+    service.warmup()
+    model = service.registry.load("v1")
+    compiled = len(_kernels.score_kernel.signatures)
+    model.predict_packed(model.pack([{"feature_a": 1.0}]))
+    model.predict_packed(model.pack([{"feature_a": 1.0}] * 3))
+    assert len(_kernels.score_kernel.signatures) == compiled
 
 
 def test_batch_submission_and_retrieval() -> None:
@@ -46,6 +125,160 @@ def test_batch_submission_and_retrieval() -> None:
         assert "predictions" in result["result"]
 
 
+def test_process_backend_runs_batch_jobs(tmp_path: Path) -> None:
+    from app.services.batch_worker import init_worker, run_batch
+
+    jobs = JobManager(
+        max_workers=1,
+        storage_dir=str(tmp_path),
+        backend="process",
+        initializer=init_worker,
+        initargs=("config/model_store", "v1"),
+    )
+    try:
+        job_id = jobs.submit(run_batch, "v1", [{"feature_a": 1.0, "feature_b": 0.2}])
+        deadline = time.monotonic() + 60
+        while jobs.status(job_id) in {"pending", "running"} and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert jobs.status(job_id) == "completed"
+        result = jobs.result(job_id)
+        assert result["version"] == "v1"
+        assert abs(result["predictions"][0]["probability"] - 0.6082590307) < 1e-6
+    finally:
+        jobs.shutdown()
+
+
+def test_job_cache_keeps_results_on_disk_only(tmp_path: Path) -> None:
+    jobs = JobManager(max_workers=1, storage_dir=str(tmp_path))
+    try:
+        job_id = jobs.submit(lambda: {"predictions": [1, 2, 3]})
+        jobs._jobs[job_id].result(timeout=10)
+        assert jobs.status(job_id) == "completed"
+        assert "result" not in jobs._state_cache[job_id]
+        assert jobs.result(job_id) == {"predictions": [1, 2, 3]}
+    finally:
+        jobs.shutdown()
+
+
+def test_job_status_revalidates_disk_state_by_mtime(tmp_path: Path, monkeypatch) -> None:
+    jobs = JobManager(max_workers=1, storage_dir=str(tmp_path))
+    path = tmp_path / "job.json"
+    path.write_text(json.dumps({"status": "running"}))
+    reads = []
+    read_job_file = jobs._read_job_file
+    monkeypatch.setattr(jobs, "_read_job_file", lambda job_id: reads.append(job_id) or read_job_file(job_id))
+    try:
+        assert jobs.status("job") == "running"
+        assert jobs.status("job") == "running"
+        assert reads == ["job"]  # Unchanged file: served from cache after a stat().
+
+        # Another process rewrites the job file.
+        path.write_text(json.dumps({"status": "completed"}))
+        stat = path.stat()
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+        assert jobs.status("job") == "completed"
+        assert reads == ["job", "job"]
+    finally:
+        jobs.shutdown()
+
+
+def _registry_with_versions(tmp_path: Path, versions, **kwargs) -> ModelRegistry:
+    for version in versions:
+        (tmp_path / version).mkdir()
+        shutil.copy("config/model_store/v1/model.json", tmp_path / version / "model.json")
+    return ModelRegistry(tmp_path, default_version=versions[0], **kwargs)
+
+
+def test_registry_defers_close_until_the_last_lease(tmp_path: Path, monkeypatch) -> None:
+    closed = []
+    monkeypatch.setattr(ExampleModel, "close", lambda self: closed.append(self.version))
+    registry = _registry_with_versions(tmp_path, ["v1", "v2"])
+    with registry.lease("v2") as model:
+        registry.unload("v2")
+        assert "v2" not in registry.list_loaded_versions()
+        assert closed == []
+        assert model.predict([{"feature_a": 1.0}])
+    assert closed == ["v2"]
+
+
+def test_registry_evicts_lru_version_and_pins_default_and_new(tmp_path: Path, monkeypatch) -> None:
+    closed = []
+    monkeypatch.setattr(ExampleModel, "close", lambda self: closed.append(self.version))
+    registry = _registry_with_versions(tmp_path, ["v1", "v2", "v3"], max_loaded_models=2)
+    for version in ("v1", "v2", "v3"):
+        registry.load(version)
+    # v1 is least recently used but pinned as the default.
+    assert sorted(registry.list_loaded_versions()) == ["v1", "v3"]
+    assert closed == ["v2"]
+    registry.load("v2")
+    assert sorted(registry.list_loaded_versions()) == ["v1", "v2"]
+    assert closed == ["v2", "v3"]
+
+    registry.max_loaded_models = 1
+    registry.load("v3")  # Only the default and the new version remain; neither is evicted.
+    assert sorted(registry.list_loaded_versions()) == ["v1", "v3"]
+    assert closed == ["v2", "v3", "v2"]
+
+
+def test_preload_keeps_the_highest_priority_versions(tmp_path: Path) -> None:
+    registry = _registry_with_versions(tmp_path, ["v1", "v2", "v3"], max_loaded_models=2)
+    settings = AppSettings(
+        env="test",
+        model_registry_path=tmp_path,
+        default_model_version="v1",
+        service_name="test",
+        batch_max_workers=1,
+        drift_window=5,
+        drift_threshold=0.1,
+        request_timeout_seconds=1.0,
+        max_loaded_models=2,
+        preload_versions=("v1", "v3", "v2", "v3"),
+    )
+    service = InferenceService(
+        settings=settings,
+        registry=registry,
+        metrics=MetricsCollector(),
+        drift_tracker=DriftTracker(window_size=5, threshold=0.1),
+        job_manager=JobManager(max_workers=1, storage_dir=str(tmp_path / "jobs")),
+    )
+    try:
+        service.warmup()
+        service.preload()
+        assert sorted(registry.list_loaded_versions()) == ["v1", "v3"]
+    finally:
+        service.job_manager.shutdown()
+
+
+def _drift_columns(features, schema_cache=None) -> dict:
+    names, values = _numeric_matrix(features, schema_cache)
+    assert values.shape == (len(features), len(names))
+    return {name: values[:, j].tolist() for j, name in enumerate(names)}
+
+
+def test_numeric_matrix_fast_and_slow_paths_agree_on_cells() -> None:
+    nan = float("nan")
+    ragged = _drift_columns([{"a": 1, "b": 2.0}, {"a": 3}])
+    np.testing.assert_array_equal(ragged["a"], [1.0, 3.0])
+    np.testing.assert_array_equal(ragged["b"], [2.0, nan])
+
+    # Numeric in the first row only: later None/str cells become NaN, and
+    # columns with no numeric cell at all are dropped.
+    mixed = _drift_columns([{"a": 1.0, "b": "x"}, {"a": None, "b": "y"}, {"a": "s", "b": "z"}])
+    assert list(mixed) == ["a"]
+    np.testing.assert_array_equal(mixed["a"], [1.0, nan, nan])
+
+    assert _drift_columns([{"a": True, "b": False}]) == {"a": [1.0], "b": [0.0]}
+    assert _drift_columns([{"a": 2.5}, {"a": 3.5}]) == {"a": [2.5, 3.5]}
+
+
+def test_numeric_matrix_reuses_the_schema_memo() -> None:
+    cache: dict = {}
+    _drift_columns([{"a": 1.0, "b": "x"}], cache)
+    schema = cache[frozenset({"a", "b"})]
+    assert _drift_columns([{"b": "y", "a": 2.0}], cache) == {"a": [2.0]}
+    assert len(cache) == 1 and cache[frozenset({"a", "b"})] is schema
+
+
 def test_drift_tracker_signals_change() -> None:
     tracker = DriftTracker(window_size=3, threshold=0.2)
     signals = []
@@ -54,3 +287,190 @@ def test_drift_tracker_signals_change() -> None:
     signals.extend(tracker.update({"feature_a": 1.0}))
     signals.extend(tracker.update({"feature_a": 2.0}))
     assert any(signal.feature == "feature_a" for signal in signals)
+
+
+def test_int8_quantized_model_tracks_float_predictions(tmp_path: Path) -> None:
+    artifact = tmp_path / "model.json"
+    artifact.write_text(
+        '{"bias": -0.4, "weights": {"feature_a": 0.8, "feature_b": 0.2}, "quantization": "int8"}'
+    )
+    quantized = ExampleModel(version="q1", model_path=artifact)
+    reference = ExampleModel(version="v1", model_path=Path("config/model_store/v1/model.json"))
+    rows = [{"feature_a": 1.0, "feature_b": 0.2}, {"feature_a": -0.5, "feature_b": 0.9}]
+    for q, r in zip(quantized.predict(rows), reference.predict(rows)):
+        assert abs(q["probability"] - r["probability"]) < 0.01
+        assert q["label"] == r["label"]
+
+
+def test_int8_prediction_does_not_depend_on_batch_mates(tmp_path: Path) -> None:
+    artifact = tmp_path / "model.json"
+    artifact.write_text(
+        '{"bias": -0.4, "weights": {"feature_a": 0.8, "feature_b": 0.2}, "quantization": "int8"}'
+    )
+    model = ExampleModel(version="q1", model_path=artifact)
+    row = {"feature_a": 1.0, "feature_b": 0.2}
+    alone = model.predict([row])[0]
+    batched = model.predict([row, {"feature_a": 400.0}])[0]
+    assert batched == alone
+    assert alone["label"] == 1
+
+
+def test_metrics_summary_estimates_percentiles() -> None:
+    metrics = MetricsCollector()
+    for value in list(range(1000, 0, -2)) + list(range(1, 1000, 2)):
+        metrics.observe_latency("inference_latency", float(value))
+    summary = metrics.summary("inference_latency")
+    assert summary["count"] == 1000
+    assert abs(summary["p50"] - 500) < 25
+    assert abs(summary["p95"] - 950) < 25
+
+
+def test_drift_tracker_score_array_matches_baseline() -> None:
+    tracker = DriftTracker(window_size=3, threshold=0.2)
+    names = ["feature_a", "feature_b"]
+    first = tracker.score_array(np.array([[1.0, np.nan], [1.0, np.nan]]), names)
+    assert np.isnan(first).all()
+    scores = tracker.score_array(np.array([[1.0, np.nan], [2.0, np.nan], [np.nan, 5.0]]), names)
+    # Baseline 1.0 from the first full window; current window is [1, 1, 2].
+    assert scores[0] == pytest.approx(1 / 3)
+    assert np.isnan(scores[1])
+
+
+def _wait_until(condition, timeout: float = 5.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.001)
+
+
+def test_priority_lock_high_waiter_preempts_between_chunks() -> None:
+    lock = PriorityLock()
+    events = []
+
+    def online() -> None:
+        with lock.hold(high_priority=True):
+            events.append("online")
+
+    with lock.hold(high_priority=False):
+        events.append("chunk 1")
+        waiter = threading.Thread(target=online)
+        waiter.start()
+        _wait_until(lambda: lock._high_waiters == 1)
+        lock.yield_if_contended()
+        events.append("chunk 2")
+        lock.yield_if_contended()  # Uncontended: returns immediately.
+    waiter.join()
+    assert events == ["chunk 1", "online", "chunk 2"]
+
+
+def test_priority_lock_low_waiter_never_overtakes_high() -> None:
+    lock = PriorityLock()
+    order = []
+
+    def worker(name: str, high_priority: bool) -> None:
+        with lock.hold(high_priority=high_priority):
+            order.append(name)
+
+    lock.acquire(high_priority=True)
+    low = threading.Thread(target=worker, args=("low", False))
+    low.start()
+    time.sleep(0.05)  # The low-priority waiter queues first.
+    high = threading.Thread(target=worker, args=("high", True))
+    high.start()
+    _wait_until(lambda: lock._high_waiters == 1)
+    lock.release()
+    low.join()
+    high.join()
+    assert order == ["high", "low"]
+
+
+def test_batch_scheduler_returns_each_caller_its_own_rows() -> None:
+    batches = []
+
+    def echo(rows, version):
+        batches.append(len(rows))
+        return [{"id": row["id"], "version": version} for row in rows]
+
+    async def run() -> list:
+        scheduler = BatchScheduler(echo, max_batch_size=32)
+        scheduler.start()
+        try:
+            requests = [[{"id": (size, i)} for i in range(size)] for size in (1, 31, 40, 1, 31)]
+            results = await asyncio.gather(*(scheduler.predict(rows, "v1") for rows in requests))
+            return list(zip(requests, results))
+        finally:
+            await scheduler.stop()
+
+    for rows, predictions in asyncio.run(run()):
+        assert [p["id"] for p in predictions] == [row["id"] for row in rows]
+    assert sum(batches) == 104 and len(batches) < 5
+
+
+def test_batch_scheduler_never_mixes_versions_in_a_batch() -> None:
+    batches = []
+
+    def record(rows, version):
+        batches.append({row["version"] for row in rows} | {version})
+        return [{"version": version} for _ in rows]
+
+    async def run() -> list:
+        scheduler = BatchScheduler(record, max_batch_size=32)
+        scheduler.start()
+        try:
+            versions = ["v1" if i % 3 else "v2" for i in range(30)]
+            results = await asyncio.gather(
+                *(scheduler.predict([{"version": v}], v) for v in versions)
+            )
+            return list(zip(versions, results))
+        finally:
+            await scheduler.stop()
+
+    for version, predictions in asyncio.run(run()):
+        assert predictions == [{"version": version}]
+    assert all(len(versions) == 1 for versions in batches)
+
+
+def _fail(breaker: CircuitBreaker) -> None:
+    with pytest.raises(RuntimeError):
+        with breaker:
+            raise RuntimeError("model failed")
+
+
+def _succeed(breaker: CircuitBreaker) -> None:
+    with breaker:
+        pass
+
+
+def test_circuit_breaker_opens_at_threshold_and_rejects() -> None:
+    breaker = CircuitBreaker(failure_threshold=3, recovery_timeout=60.0)
+    _fail(breaker)
+    _fail(breaker)
+    assert breaker.state == "CLOSED"
+    _fail(breaker)
+    assert breaker.state == "OPEN"
+    with pytest.raises(CircuitBreakerOpen):
+        _succeed(breaker)
+
+
+def test_circuit_breaker_half_open_trial_closes_or_reopens() -> None:
+    breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=0.01)
+    _fail(breaker)
+    time.sleep(0.02)
+    _fail(breaker)  # Failed HALF_OPEN trial re-opens immediately.
+    assert breaker.state == "OPEN"
+    time.sleep(0.02)
+    _succeed(breaker)  # Successful trial closes the circuit.
+    assert breaker.state == "CLOSED"
+    assert breaker._failure_count == 0
+
+
+def test_circuit_breaker_success_resets_failure_streak() -> None:
+    breaker = CircuitBreaker(failure_threshold=3, recovery_timeout=60.0)
+    _fail(breaker)
+    _fail(breaker)
+    _succeed(breaker)
+    _fail(breaker)
+    _fail(breaker)
+    assert breaker.state == "CLOSED"
+    _fail(breaker)
+    assert breaker.state == "OPEN"
@@ -1,59 +1,75 @@
 import httpx
 import asyncio
+import random
 import time
 import statistics
 
+# Start the server with SIMULATE_GPU_LATENCY=1 so the model serializes batches.
 BATCH_URL = "http://localhost:8001/batch"
 PREDICT_URL = "http://localhost:8001/predict"
 
 # 1000 items -> ~1.0s total processing time if single batch.
 # With chunking (32), it should be 32 chunks of ~42ms each.
-BATCH_SIZE = 1000 
+BATCH_SIZE = 1000
 
-async def submit_batch_job():
+async def submit_batch_job(client):
     print(f"Submitting batch job with {BATCH_SIZE} items...")
     inputs = [{"feature_a": 0.5} for _ in range(BATCH_SIZE)]
-    async with httpx.AsyncClient() as client:
-        resp = await client.post(BATCH_URL, json={"instances": inputs}, timeout=10.0)
-        data = resp.json()
-        print(f"Batch Submitted: {data}")
-        return data["job_id"]
+    resp = await client.post(BATCH_URL, json={"instances": inputs}, timeout=10.0)
+    data = resp.json()
+    print(f"Batch Submitted: {data}")
+    return data["job_id"]
 
-async def poll_batch_job(job_id):
-    async with httpx.AsyncClient() as client:
-        while True:
-            resp = await client.get(f"{BATCH_URL}/{job_id}")
-            status = resp.json().get("status")
-            if status in ["completed", "failed"]:
-                print(f"Batch Job {status}")
-                return
-            await asyncio.sleep(0.5)
+async def poll_batch_job(client, job_id):
+    while True:
+        resp = await client.get(f"{BATCH_URL}/{job_id}")
+        status = resp.json().get("status")
+        if status in ["completed", "failed"]:
+            print(f"Batch Job {status}")
+            return
+        await asyncio.sleep(0.5)
 
-async def run_online_traffic(duration_sec=3):
+async def timed_predict(client, latencies):
+    # Distinct inputs so requests reach the model instead of the response cache.
+    instances = [{"feature_a": random.random()}]
+    start = time.perf_counter()
+    try:
+        await client.post(PREDICT_URL, json={"instances": instances}, timeout=2.0)
+        latencies.append((time.perf_counter() - start) * 1000)
+    except Exception as e:
+        print(f"Online request failed: {e}")
+
+async def run_online_traffic(client, duration_sec=3, rps=10):
+    # Open loop: requests are sent on schedule even while earlier ones are
+    # still in flight, so a stalled server shows up as latency, not as fewer
+    # requests.
     print("Starting online traffic...")
     latencies = []
-    end_time = time.time() + duration_sec
-    async with httpx.AsyncClient() as client:
-        while time.time() < end_time:
-            start = time.time()
-            try:
-                await client.post(PREDICT_URL, json={"instances": [{"feature_a": 0.5}]}, timeout=2.0)
-                latencies.append((time.time() - start) * 1000)
-            except Exception as e:
-                print(f"Online request failed: {e}")
-            await asyncio.sleep(0.1) # 10 RPS
+    tasks = []
+    end_time = time.monotonic() + duration_sec
+    while time.monotonic() < end_time:
+        tasks.append(asyncio.create_task(timed_predict(client, latencies)))
+        await asyncio.sleep(1.0 / rps)
+    await asyncio.gather(*tasks)
     return latencies
 
 async def main():
-    # 1. Start Batch Job
-    job_id = await submit_batch_job()
-    
-    # 2. Immediately run online traffic while batch is running
-    latencies = await run_online_traffic(duration_sec=5)
-    
-    # 3. Wait for batch to finish
-    await poll_batch_job(job_id)
-    
+    # One keep-alive client for the whole run, so measured latencies exclude
+    # connection setup. uvicorn serves HTTP/1.1 only, hence no http2=True.
+    limits = httpx.Limits(max_keepalive_connections=20, max_connections=20)
+    async with httpx.AsyncClient(limits=limits) as client:
+        # Warm up the connection pool (and the server's model) before measuring.
+        await client.post(PREDICT_URL, json={"instances": [{"feature_a": 0.5}]}, timeout=10.0)
+
+        # 1. Start Batch Job
+        job_id = await submit_batch_job(client)
+
+        # 2. Immediately run online traffic while batch is running
+        latencies = await run_online_traffic(client, duration_sec=5)
+
+        # 3. Wait for batch to finish
+        await poll_batch_job(client, job_id)
+
     # 4. Analyze
     if latencies:
         avg = statistics.mean(latencies)